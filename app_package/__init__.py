@@ -1,8 +1,13 @@
+import importlib
+import logging
+from apscheduler.triggers.cron import CronTrigger
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from flask_apscheduler import APScheduler
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import SQLAlchemyError
 from config import Config
 
 db = SQLAlchemy()
@@ -10,6 +15,25 @@ migrate = Migrate()
 csrf = CSRFProtect()
 scheduler = APScheduler()
 
+logger = logging.getLogger(__name__)
+
+# (module path, blueprint attribute, url prefix)
+BLUEPRINTS = [
+    ('app_package.routes.dashboard', 'dashboard_bp', None),
+    ('app_package.routes.contacts', 'contacts_bp', '/contacts'),
+    ('app_package.routes.brochures', 'brochures_bp', '/brochures'),
+    ('app_package.routes.email_sender', 'email_bp', '/email'),
+    ('app_package.routes.whatsapp_sender', 'whatsapp_bp', '/whatsapp'),
+    ('app_package.routes.search', 'search_bp', '/search'),
+    ('app_package.routes.facebook', 'facebook_bp', '/facebook'),
+    ('app_package.routes.deal_tracker', 'deal_tracker_bp', '/deals'),
+    ('app_package.routes.job_tracker', 'job_tracker_bp', '/jobs'),
+    ('app_package.routes.hotel_tracker', 'hotel_tracker_bp', '/hotels'),
+    ('app_package.routes.settings', 'settings_bp', '/settings'),
+    ('app_package.routes.ai_assistant', 'ai_assistant_bp', '/ai'),
+    ('app_package.routes.youtube_leads', 'youtube_leads_bp', '/youtube'),
+]
+
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -24,143 +48,122 @@ def create_app(config_class=Config):
     os.makedirs(app.config.get('BROCHURE_FOLDER', ''), exist_ok=True)
     os.makedirs(app.config.get('CSV_TEMP_FOLDER', ''), exist_ok=True)
 
-    # Register blueprints
-    from app_package.routes.dashboard import dashboard_bp
-    from app_package.routes.contacts import contacts_bp
-    from app_package.routes.brochures import brochures_bp
-    from app_package.routes.email_sender import email_bp
-    from app_package.routes.whatsapp_sender import whatsapp_bp
-    from app_package.routes.search import search_bp
-    from app_package.routes.settings import settings_bp
-    from app_package.routes.facebook import facebook_bp
-    from app_package.routes.deal_tracker import deal_tracker_bp
-    from app_package.routes.job_tracker import job_tracker_bp
-    from app_package.routes.hotel_tracker import hotel_tracker_bp
-    from app_package.routes.ai_assistant import ai_assistant_bp
-    from app_package.routes.youtube_leads import youtube_leads_bp
-
-    app.register_blueprint(dashboard_bp)
-    app.register_blueprint(contacts_bp, url_prefix='/contacts')
-    app.register_blueprint(brochures_bp, url_prefix='/brochures')
-    app.register_blueprint(email_bp, url_prefix='/email')
-    app.register_blueprint(whatsapp_bp, url_prefix='/whatsapp')
-    app.register_blueprint(search_bp, url_prefix='/search')
-    app.register_blueprint(facebook_bp, url_prefix='/facebook')
-    app.register_blueprint(deal_tracker_bp, url_prefix='/deals')
-    app.register_blueprint(job_tracker_bp, url_prefix='/jobs')
-    app.register_blueprint(hotel_tracker_bp, url_prefix='/hotels')
-    app.register_blueprint(settings_bp, url_prefix='/settings')
-    app.register_blueprint(ai_assistant_bp, url_prefix='/ai')
-    app.register_blueprint(youtube_leads_bp, url_prefix='/youtube')
+    # Register blueprints — each module is imported only when it is registered
+    for module_path, attr, url_prefix in BLUEPRINTS:
+        blueprint = getattr(importlib.import_module(module_path), attr)
+        if url_prefix:
+            app.register_blueprint(blueprint, url_prefix=url_prefix)
+        else:
+            app.register_blueprint(blueprint)
 
     with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
+
         from app_package import models  # noqa: F401
         db.create_all()
 
         # Migrate existing candidate tables — add new columns if missing
         _migrate_candidate_columns(db)
 
-    # Initialize scheduler with jobs
-    _setup_scheduler(app)
+        # create_all() skips tables that already exist, so add any new indexes
+        _create_missing_indexes(db)
+
+        # Initialize scheduler with jobs (web worker only, never under tests)
+        if app.config.get('ENABLE_SCHEDULER') and not app.config.get('TESTING'):
+            from app_package.models import ScheduledJob as SJ
+            job_rows = db.session.execute(
+                db.select(SJ.job_name, SJ.schedule_hour, SJ.schedule_minute, SJ.is_enabled)
+            ).all()
+            _setup_scheduler(app, job_rows)
 
     return app
 
 
-def _setup_scheduler(app):
-    """Configure APScheduler with daily automation jobs."""
-    from app_package.scheduler_jobs import (
-        run_daily_search, run_daily_email, run_daily_whatsapp,
-        run_daily_deal_check, run_daily_job_check, run_daily_hotel_check
-    )
-    from app_package.routes.facebook import auto_fetch_fb_enquiries
+def _setup_scheduler(app, job_rows):
+    """Configure APScheduler with daily automation jobs.
 
+    ``job_rows`` are the (job_name, hour, minute, is_enabled) overrides read
+    from the ScheduledJob table.
+    """
     # Default jobs - will be overridden by DB settings at runtime
-    app.config['JOBS'] = [
-        {
-            'id': 'daily_search',
-            'func': lambda: run_daily_search(app),
-            'trigger': 'cron',
-            'hour': 9,
-            'minute': 0,
-        },
-        {
-            'id': 'daily_email',
-            'func': lambda: run_daily_email(app),
-            'trigger': 'cron',
-            'hour': 10,
-            'minute': 0,
-        },
-        {
-            'id': 'daily_whatsapp',
-            'func': lambda: run_daily_whatsapp(app),
-            'trigger': 'cron',
-            'hour': 11,
-            'minute': 0,
-        },
-        {
-            'id': 'daily_facebook',
-            'func': lambda: auto_fetch_fb_enquiries(app),
-            'trigger': 'cron',
-            'hour': 8,
-            'minute': 30,
-        },
-        {
-            'id': 'daily_deal_check',
-            'func': lambda: run_daily_deal_check(app),
-            'trigger': 'cron',
-            'hour': 8,
-            'minute': 0,
-        },
-        {
-            'id': 'daily_job_check',
-            'func': lambda: run_daily_job_check(app),
-            'trigger': 'cron',
-            'hour': 7,
-            'minute': 30,
-        },
-        {
-            'id': 'daily_hotel_check',
-            'func': lambda: run_daily_hotel_check(app),
-            'trigger': 'cron',
-            'hour': 7,
-            'minute': 0,
-        },
+    default_jobs = [
+        ('daily_search', 'daily_search_task', 9, 0),
+        ('daily_email', 'daily_email_task', 10, 0),
+        ('daily_whatsapp', 'daily_whatsapp_task', 11, 0),
+        ('daily_facebook', 'daily_facebook_task', 8, 30),
+        ('daily_tracker_check', 'daily_tracker_check_task', 7, 0),
     ]
+    # Superseded by daily_tracker_check; dropped from existing job stores
+    retired_jobs = ('daily_deal_check', 'daily_job_check', 'daily_hotel_check')
 
     scheduler.init_app(app)
     scheduler.start()
+    if not scheduler.running:
+        return
+
+    for job_id in retired_jobs:
+        if scheduler.get_job(job_id) is not None:
+            scheduler.remove_job(job_id)
+
+    # Jobs live in the database job store, so only add the ones it doesn't
+    # have yet — existing entries keep their next run time across restarts.
+    for job_id, task, hour, minute in default_jobs:
+        if scheduler.get_job(job_id) is None:
+            scheduler.add_job(job_id, f'app_package.scheduler_jobs:{task}',
+                              trigger='cron', hour=hour, minute=minute)
 
     # Update job schedules from DB
-    with app.app_context():
-        from app_package.models import ScheduledJob as SJ
-        for job_record in db.session.query(SJ).all():
-            try:
-                scheduler.modify_job(
-                    job_record.job_name,
-                    trigger='cron',
-                    hour=job_record.schedule_hour,
-                    minute=job_record.schedule_minute
-                )
-                if not job_record.is_enabled:
-                    scheduler.pause_job(job_record.job_name)
-            except Exception:
-                pass
+    for job_name, hour, minute, is_enabled in job_rows:
+        job = scheduler.get_job(job_name)
+        if job is None:
+            logger.warning('Scheduled job %s has no scheduler entry', job_name)
+            continue
+        if str(job.trigger) != str(CronTrigger(hour=hour, minute=minute)):
+            scheduler.modify_job(job_name, trigger='cron', hour=hour, minute=minute)
+        if not is_enabled:
+            scheduler.pause_job(job_name)
+        elif job.next_run_time is None:
+            scheduler.resume_job(job_name)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL with NORMAL sync so bulk writes don't fsync on every commit."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+
+def _create_missing_indexes(database):
+    """Create model indexes that are missing from existing tables."""
+    for table in database.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(database.engine, checkfirst=True)
 
 
 def _migrate_candidate_columns(database):
     """Add new candidate columns to existing SQLite databases."""
-    migrations = [
-        ('candidate_searches', 'platforms', "ALTER TABLE candidate_searches ADD COLUMN platforms TEXT DEFAULT '[\"linkedin\"]'"),
-        ('candidate_results', 'platform', "ALTER TABLE candidate_results ADD COLUMN platform VARCHAR(50) DEFAULT 'linkedin'"),
-        ('candidate_results', 'instagram_url', "ALTER TABLE candidate_results ADD COLUMN instagram_url VARCHAR(1000) DEFAULT ''"),
-    ]
-    for table, column, sql in migrations:
-        try:
-            database.session.execute(database.text(
-                f"SELECT {column} FROM {table} LIMIT 1"))
-        except Exception:
-            try:
-                database.session.execute(database.text(sql))
-                database.session.commit()
-            except Exception:
-                database.session.rollback()
+    migrations = {
+        'candidate_searches': [
+            ('platforms', "ALTER TABLE candidate_searches ADD COLUMN platforms TEXT DEFAULT '[\"linkedin\"]'"),
+        ],
+        'candidate_results': [
+            ('platform', "ALTER TABLE candidate_results ADD COLUMN platform VARCHAR(50) DEFAULT 'linkedin'"),
+            ('instagram_url', "ALTER TABLE candidate_results ADD COLUMN instagram_url VARCHAR(1000) DEFAULT ''"),
+        ],
+    }
+    inspector = inspect(database.engine)
+    pending = []
+    for table, columns in migrations.items():
+        existing = {col['name'] for col in inspector.get_columns(table)}
+        pending.extend(sql for column, sql in columns if column not in existing)
+    if not pending:
+        return
+    try:
+        for sql in pending:
+            database.session.execute(database.text(sql))
+        database.session.commit()
+    except SQLAlchemyError as e:
+        database.session.rollback()
+        logger.warning('Candidate column migration failed: %s', e)
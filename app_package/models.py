@@ -1,12 +1,31 @@
+import logging
+import time
 from datetime import datetime, timezone
+from cryptography.fernet import InvalidToken
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app_package import db
 
+logger = logging.getLogger(__name__)
+
+# Process-local cache of decoded settings: key -> (value or None, expires_at)
+_SETTINGS_CACHE = {}
+_SETTINGS_CACHE_TTL = 30  # seconds
+
+# Scraped listing descriptions are capped at ingest; results pages only show
+# the first couple of hundred characters.
+LISTING_DESCRIPTION_MAX = 500
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
 
 class Contact(db.Model):
     __tablename__ = 'contacts'
 
     id = db.Column(db.Integer, primary_key=True)
-    company_name = db.Column(db.String(200), nullable=False)
+    company_name = db.Column(db.String(200), nullable=False, index=True)
     contact_person = db.Column(db.String(200), default='')
     email = db.Column(db.String(200), default='')
     phone = db.Column(db.String(50), default='')
@@ -18,13 +37,13 @@ class Contact(db.Model):
     category = db.Column(db.String(100), default='Other')
     notes = db.Column(db.Text, default='')
     source = db.Column(db.String(100), default='manual')  # manual, csv, google_search
-    status = db.Column(db.String(50), default='new')  # new, contacted, responded, converted, inactive
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
-                           onupdate=lambda: datetime.now(timezone.utc))
+    status = db.Column(db.String(50), default='new', index=True)  # new, contacted, responded, converted, inactive
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now(),
+                           onupdate=_utcnow)
 
-    messages = db.relationship('MessageLog', backref='contact', lazy='dynamic',
-                               cascade='all, delete-orphan')
+    messages = db.relationship('MessageLog', back_populates='contact', lazy='select',
+                               cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<Contact {self.company_name}>'
@@ -34,7 +53,7 @@ class MessageLog(db.Model):
     __tablename__ = 'message_logs'
 
     id = db.Column(db.Integer, primary_key=True)
-    contact_id = db.Column(db.Integer, db.ForeignKey('contacts.id'), nullable=False)
+    contact_id = db.Column(db.Integer, db.ForeignKey('contacts.id', ondelete='CASCADE'), nullable=False, index=True)
     channel = db.Column(db.String(20), nullable=False)  # email, whatsapp
     status = db.Column(db.String(20), default='pending')  # pending, sent, failed, delivered
     subject = db.Column(db.String(300), default='')
@@ -42,10 +61,15 @@ class MessageLog(db.Model):
     brochure_id = db.Column(db.Integer, db.ForeignKey('brochures.id'), nullable=True)
     error_message = db.Column(db.Text, default='')
     sent_at = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
+    contact = db.relationship('Contact', back_populates='messages')
     brochure = db.relationship('Brochure', backref='message_logs')
 
+    __table_args__ = (
+        db.Index('ix_message_logs_channel_status_sent', 'channel', 'status', 'sent_at'),
+    )
+
     def __repr__(self):
         return f'<MessageLog {self.channel} to contact {self.contact_id}>'
 
@@ -60,7 +84,14 @@ class Brochure(db.Model):
     file_size = db.Column(db.Integer, default=0)
     is_default = db.Column(db.Boolean, default=False)
     description = db.Column(db.Text, default='')
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
+
+    # Partial index: only the (single) default brochure is indexed
+    __table_args__ = (
+        db.Index('ix_brochures_default', 'is_default',
+                 sqlite_where=db.text('is_default'),
+                 postgresql_where=db.text('is_default')),
+    )
 
     def __repr__(self):
         return f'<Brochure {self.original_filename}>'
@@ -74,7 +105,7 @@ class SearchLog(db.Model):
     source = db.Column(db.String(50), default='google_api')  # google_api, scraping
     results_count = db.Column(db.Integer, default=0)
     contacts_saved = db.Column(db.Integer, default=0)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
     def __repr__(self):
         return f'<SearchLog "{self.query}">'
@@ -87,39 +118,98 @@ class AppSetting(db.Model):
     key = db.Column(db.String(100), unique=True, nullable=False)
     value = db.Column(db.Text, default='')
     is_encrypted = db.Column(db.Boolean, default=False)
-    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
-                           onupdate=lambda: datetime.now(timezone.utc))
+    updated_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now(),
+                           onupdate=_utcnow)
 
     @staticmethod
-    def get(key, default=''):
-        setting = db.session.query(AppSetting).filter_by(key=key).first()
-        if setting is None:
-            return default
-        if setting.is_encrypted and setting.value:
+    def _decode(key, value, is_encrypted):
+        """Decrypt a stored value; raises InvalidToken if it can't be."""
+        if is_encrypted and value:
             from config import Config
             try:
-                fernet = Config.get_fernet()
-                return fernet.decrypt(setting.value.encode()).decode()
-            except Exception:
+                return Config.get_fernet().decrypt(value.encode()).decode()
+            except InvalidToken:
+                logger.warning('Could not decrypt setting %s — was FERNET_KEY changed?', key)
+                raise
+        return value
+
+    @staticmethod
+    def get(key, default=''):
+        cached = _SETTINGS_CACHE.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return default if cached[0] is None else cached[0]
+
+        row = db.session.execute(
+            db.select(AppSetting.value, AppSetting.is_encrypted).filter_by(key=key)
+        ).first()
+        if row is None:
+            value = None
+        else:
+            try:
+                value = AppSetting._decode(key, row.value, row.is_encrypted)
+            except InvalidToken:
                 return default
-        return setting.value
+        _SETTINGS_CACHE[key] = (value, time.monotonic() + _SETTINGS_CACHE_TTL)
+        return default if value is None else value
+
+    @staticmethod
+    def get_many(defaults):
+        """Look up several settings at once: ``{key: default}`` -> ``{key: value}``.
+
+        Keys not already cached are fetched in a single query.
+        """
+        now = time.monotonic()
+        values = {}
+        missing = []
+        for key in defaults:
+            cached = _SETTINGS_CACHE.get(key)
+            if cached is not None and cached[1] > now:
+                values[key] = cached[0]
+            else:
+                missing.append(key)
+
+        if missing:
+            rows = db.session.execute(
+                db.select(AppSetting.key, AppSetting.value, AppSetting.is_encrypted)
+                .where(AppSetting.key.in_(missing))
+            ).all()
+            found = {row.key: row for row in rows}
+            expires = time.monotonic() + _SETTINGS_CACHE_TTL
+            for key in missing:
+                row = found.get(key)
+                if row is None:
+                    value = None
+                else:
+                    try:
+                        value = AppSetting._decode(key, row.value, row.is_encrypted)
+                    except InvalidToken:
+                        values[key] = None
+                        continue
+                _SETTINGS_CACHE[key] = (value, expires)
+                values[key] = value
+
+        return {key: default if values[key] is None else values[key]
+                for key, default in defaults.items()}
 
     @staticmethod
     def set(key, value, encrypted=False):
-        from app_package import db as _db
-        setting = db.session.query(AppSetting).filter_by(key=key).first()
         store_value = value
         if encrypted and value:
             from config import Config
-            fernet = Config.get_fernet()
-            store_value = fernet.encrypt(value.encode()).decode()
-        if setting is None:
-            setting = AppSetting(key=key, value=store_value, is_encrypted=encrypted)
-            _db.session.add(setting)
-        else:
-            setting.value = store_value
-            setting.is_encrypted = encrypted
-        _db.session.commit()
+            store_value = Config.get_fernet().encrypt(value.encode()).decode()
+        # Single-statement upsert on the unique key (SQLite and Postgres)
+        insert = pg_insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite_insert
+        stmt = insert(AppSetting).values(key=key, value=store_value, is_encrypted=encrypted,
+                                         updated_at=_utcnow())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={'value': stmt.excluded.value,
+                  'is_encrypted': stmt.excluded.is_encrypted,
+                  'updated_at': stmt.excluded.updated_at},
+        )
+        db.session.execute(stmt)
+        db.session.commit()
+        _SETTINGS_CACHE.pop(key, None)
 
     def __repr__(self):
         return f'<AppSetting {self.key}>'
@@ -140,7 +230,7 @@ class FacebookSource(db.Model):
     last_scanned = db.Column(db.DateTime, nullable=True)
     leads_found = db.Column(db.Integer, default=0)
     added_keyword = db.Column(db.String(200), default='')
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
     def __repr__(self):
         return f'<FacebookSource {self.source_type}:{self.name}>'
@@ -158,7 +248,7 @@ class ScheduledJob(db.Model):
     last_run = db.Column(db.DateTime, nullable=True)
     last_status = db.Column(db.String(50), default='never_run')
     last_result = db.Column(db.Text, default='')
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
     def __repr__(self):
         return f'<ScheduledJob {self.job_name}>'
@@ -177,10 +267,10 @@ class DealTracker(db.Model):
     whatsapp_number = db.Column(db.String(20), default='')
     is_active = db.Column(db.Boolean, default=True)
     last_checked = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
-    listings = db.relationship('DealListing', backref='tracker', lazy='dynamic',
-                               cascade='all, delete-orphan')
+    listings = db.relationship('DealListing', back_populates='tracker', lazy='select',
+                               cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<DealTracker "{self.search_query}">'
@@ -188,18 +278,25 @@ class DealTracker(db.Model):
 
 class DealListing(db.Model):
     __tablename__ = 'deal_listings'
+    __table_args__ = (
+        db.Index('ix_deal_listings_tracker_new', 'tracker_id', 'is_new'),
+        db.Index('ix_deal_listings_tracker_found', 'tracker_id', 'found_at'),
+        db.Index('ix_deal_listings_tracker_url', 'tracker_id', 'url'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    tracker_id = db.Column(db.Integer, db.ForeignKey('deal_trackers.id'), nullable=False)
+    tracker_id = db.Column(db.Integer, db.ForeignKey('deal_trackers.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(500), default='')
     price = db.Column(db.String(100), default='')
     location = db.Column(db.String(200), default='')
     url = db.Column(db.String(1000), default='')
     image_url = db.Column(db.String(1000), default='')
     platform = db.Column(db.String(50), default='olx')  # olx/quikr/facebook
-    description = db.Column(db.Text, default='')
+    description = db.deferred(db.Column(db.Text, default=''))  # loaded only by results views
     is_new = db.Column(db.Boolean, default=True)
-    found_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    found_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
+
+    tracker = db.relationship('DealTracker', back_populates='listings')
 
     def __repr__(self):
         return f'<DealListing "{self.title}">'
@@ -218,10 +315,10 @@ class JobTracker(db.Model):
     whatsapp_number = db.Column(db.String(20), default='')
     is_active = db.Column(db.Boolean, default=True)
     last_checked = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
-    listings = db.relationship('JobListing', backref='tracker', lazy='dynamic',
-                               cascade='all, delete-orphan')
+    listings = db.relationship('JobListing', back_populates='tracker', lazy='select',
+                               cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<JobTracker "{self.search_query}">'
@@ -229,9 +326,13 @@ class JobTracker(db.Model):
 
 class JobListing(db.Model):
     __tablename__ = 'job_listings'
+    __table_args__ = (
+        db.Index('ix_job_listings_tracker_new', 'tracker_id', 'is_new'),
+        db.Index('ix_job_listings_tracker_found', 'tracker_id', 'found_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    tracker_id = db.Column(db.Integer, db.ForeignKey('job_trackers.id'), nullable=False)
+    tracker_id = db.Column(db.Integer, db.ForeignKey('job_trackers.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(500), default='')
     company = db.Column(db.String(300), default='')
     location = db.Column(db.String(200), default='')
@@ -239,10 +340,12 @@ class JobListing(db.Model):
     experience = db.Column(db.String(100), default='')
     url = db.Column(db.String(1000), default='')
     platform = db.Column(db.String(50), default='linkedin')
-    description = db.Column(db.Text, default='')
+    description = db.deferred(db.Column(db.Text, default=''))  # loaded only by results views
     posted_date = db.Column(db.String(100), default='')
     is_new = db.Column(db.Boolean, default=True)
-    found_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    found_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
+
+    tracker = db.relationship('JobTracker', back_populates='listings')
 
     def __repr__(self):
         return f'<JobListing "{self.title}">'
@@ -263,10 +366,10 @@ class HotelTracker(db.Model):
     whatsapp_number = db.Column(db.String(20), default='')
     is_active = db.Column(db.Boolean, default=True)
     last_checked = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
-    listings = db.relationship('HotelListing', backref='tracker', lazy='dynamic',
-                               cascade='all, delete-orphan')
+    listings = db.relationship('HotelListing', back_populates='tracker', lazy='select',
+                               cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<HotelTracker "{self.destination}">'
@@ -274,9 +377,13 @@ class HotelTracker(db.Model):
 
 class HotelListing(db.Model):
     __tablename__ = 'hotel_listings'
+    __table_args__ = (
+        db.Index('ix_hotel_listings_tracker_new', 'tracker_id', 'is_new'),
+        db.Index('ix_hotel_listings_tracker_found', 'tracker_id', 'found_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    tracker_id = db.Column(db.Integer, db.ForeignKey('hotel_trackers.id'), nullable=False)
+    tracker_id = db.Column(db.Integer, db.ForeignKey('hotel_trackers.id', ondelete='CASCADE'), nullable=False)
     name = db.Column(db.String(500), default='')
     price = db.Column(db.String(100), default='')
     rating = db.Column(db.String(50), default='')
@@ -284,9 +391,11 @@ class HotelListing(db.Model):
     url = db.Column(db.String(1000), default='')
     image_url = db.Column(db.String(1000), default='')
     platform = db.Column(db.String(50), default='booking')
-    description = db.Column(db.Text, default='')
+    description = db.deferred(db.Column(db.Text, default=''))  # loaded only by results views
     is_new = db.Column(db.Boolean, default=True)
-    found_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    found_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
+
+    tracker = db.relationship('HotelTracker', back_populates='listings')
 
     def __repr__(self):
         return f'<HotelListing "{self.name}">'
@@ -303,10 +412,10 @@ class CandidateSearch(db.Model):
     status = db.Column(db.String(50), default='pending')  # pending, completed, failed
     error_message = db.Column(db.Text, default='')
     platforms = db.Column(db.Text, default='["linkedin"]')  # JSON list of platforms searched
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
-    results = db.relationship('CandidateResult', backref='search', lazy='dynamic',
-                              cascade='all, delete-orphan')
+    results = db.relationship('CandidateResult', back_populates='search', lazy='select',
+                              cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<CandidateSearch "{self.search_query}">'
@@ -314,9 +423,12 @@ class CandidateSearch(db.Model):
 
 class CandidateResult(db.Model):
     __tablename__ = 'candidate_results'
+    __table_args__ = (
+        db.Index('ix_candidate_results_search_platform', 'search_id', 'platform'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    search_id = db.Column(db.Integer, db.ForeignKey('candidate_searches.id'), nullable=False)
+    search_id = db.Column(db.Integer, db.ForeignKey('candidate_searches.id', ondelete='CASCADE'), nullable=False)
     name = db.Column(db.String(300), default='')
     title = db.Column(db.String(500), default='')  # role / designation
     company = db.Column(db.String(300), default='')
@@ -330,7 +442,9 @@ class CandidateResult(db.Model):
     platform = db.Column(db.String(50), default='linkedin')  # linkedin, facebook, instagram
     is_contacted = db.Column(db.Boolean, default=False)
     is_saved = db.Column(db.Boolean, default=False)  # saved to main Contacts
-    found_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    found_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
+
+    search = db.relationship('CandidateSearch', back_populates='results')
 
     @property
     def profile_url(self):
@@ -355,10 +469,10 @@ class EnquirySearch(db.Model):
     total_found = db.Column(db.Integer, default=0)
     status = db.Column(db.String(50), default='pending')  # pending, completed, failed
     error_message = db.Column(db.Text, default='')
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
 
-    results = db.relationship('EnquiryResult', backref='search', lazy='dynamic',
-                              cascade='all, delete-orphan')
+    results = db.relationship('EnquiryResult', back_populates='search', lazy='select',
+                              cascade='all, delete-orphan', passive_deletes=True)
 
     def __repr__(self):
         return f'<EnquirySearch "{self.search_query}">'
@@ -366,9 +480,14 @@ class EnquirySearch(db.Model):
 
 class EnquiryResult(db.Model):
     __tablename__ = 'enquiry_results'
+    __table_args__ = (
+        db.Index('ix_enquiry_results_search_platform', 'search_id', 'platform'),
+        # Keyset pagination on the results page walks id within one search
+        db.Index('ix_enquiry_results_search_id', 'search_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    search_id = db.Column(db.Integer, db.ForeignKey('enquiry_searches.id'), nullable=False)
+    search_id = db.Column(db.Integer, db.ForeignKey('enquiry_searches.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(500), default='')
     snippet = db.Column(db.Text, default='')
     url = db.Column(db.String(1000), default='')
@@ -377,7 +496,9 @@ class EnquiryResult(db.Model):
     posted_date = db.Column(db.String(100), default='')
     image_url = db.Column(db.String(1000), default='')
     is_saved = db.Column(db.Boolean, default=False)
-    found_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    found_at = db.Column(db.DateTime, default=_utcnow, server_default=db.func.now())
+
+    search = db.relationship('EnquirySearch', back_populates='results')
 
     def __repr__(self):
         return f'<EnquiryResult "{self.title[:50]}">'
@@ -1,5 +1,10 @@
 import json
+import random
+import re
 import time
+from string import Template
+import requests
+from requests.adapters import HTTPAdapter
 from flask import (Blueprint, render_template, request, redirect, url_for,
                    flash, jsonify)
 from app_package import db
@@ -14,39 +19,95 @@ GEMINI_MODELS = [
     "gemini-1.5-flash",
 ]
 
+GEMINI_MODEL_URLS = {
+    model: f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+    for model in GEMINI_MODELS
+}
+
+GEMINI_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "maxOutputTokens": 2048,
+}
+
+PRODUCT_ANALYSIS_PROMPT = Template("""You are a business intelligence analyst specializing in Indian B2B markets.
+
+Analyze this product: "$product"
+
+Return a JSON object (no markdown, just raw JSON) with these keys:
+
+{
+  "product_name": "$product",
+  "market_rating": <number 1-10>,
+  "market_summary": "<2-3 sentence summary of market potential in India>",
+  "strengths": ["<strength 1>", "<strength 2>", "<strength 3>"],
+  "improvements": [
+    {"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"},
+    {"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"},
+    {"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"},
+    {"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"}
+  ],
+  "target_industries": ["<industry 1>", "<industry 2>", "<industry 3>", "<industry 4>"],
+  "lead_search_queries": [
+    "<Google search query to find buyers/suppliers 1>",
+    "<Google search query to find buyers/suppliers 2>",
+    "<Google search query to find buyers/suppliers 3>",
+    "<Google search query to find buyers/suppliers 4>",
+    "<Google search query to find buyers/suppliers 5>"
+  ],
+  "email_pitch": "<Short 3-4 sentence cold email pitch for this product>",
+  "pricing_insight": "<1-2 sentence insight about typical pricing or market rates>"
+}
+
+Focus on the Indian market. Make the search queries specific and useful for finding real business contacts (include words like 'email', 'contact', 'supplier', 'buyer', 'India').
+Return ONLY valid JSON, no extra text.""")
+
+# Markdown code fence wrapped around a JSON reply, e.g. ```json ... ```
+_FENCE_RE = re.compile(r"\A```(?:json|JSON)?[ \t]*\n?(.*?)\n?```\s*\Z", re.S)
+
+# Shared session so retries and model fallbacks reuse the open TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
 
 def get_gemini_response(prompt, api_key):
     """Call Google Gemini API with retry and model fallback."""
-    import requests as req
-
     payload = {
         "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "temperature": 0.7,
-            "maxOutputTokens": 2048,
-        }
+        "generationConfig": GEMINI_GENERATION_CONFIG,
     }
+    # Key goes in a header so it never shows up in URLs or error messages
+    headers = {"x-goog-api-key": api_key}
 
     last_error = None
     for model in GEMINI_MODELS:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
+        url = GEMINI_MODEL_URLS[model]
         for attempt in range(3):
             try:
-                resp = req.post(url, json=payload, timeout=30)
-                if resp.status_code == 429:
-                    wait = 5 + attempt * 5  # 5s, 10s, 15s
-                    last_error = f"Rate limited on {model} (attempt {attempt + 1}). "
-                    time.sleep(wait)
-                    continue
-                if resp.status_code == 404:
-                    last_error = f"Model {model} not available. "
-                    break  # Skip to next model
+                resp = _SESSION.post(url, json=payload, headers=headers, timeout=(5, 30))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = f"{e}. "
+                continue  # Transient network error, retry same model
+            except requests.RequestException as e:
+                last_error = f"{e}. "
+                break  # Try next model
+            if resp.status_code == 429:
+                wait = min(30, 2 ** attempt) + random.random()  # ~1s, 2s, 4s
+                last_error = f"Rate limited on {model} (attempt {attempt + 1}). "
+                time.sleep(wait)
+                continue
+            if resp.status_code == 404:
+                last_error = f"Model {model} not available. "
+                break  # Skip to next model
+            if resp.status_code in (400, 401, 403):
+                # Bad key or bad request — every other model would fail the same way
+                return None, f"Gemini rejected the request ({resp.status_code}): {resp.text[:200]}"
+            try:
                 resp.raise_for_status()
                 data = resp.json()
                 text = data["candidates"][0]["content"]["parts"][0]["text"]
                 return text, None
-            except Exception as e:
-                last_error = str(e)
+            except (requests.HTTPError, ValueError, KeyError, IndexError) as e:
+                last_error = f"{e}. "
                 break  # Try next model
 
     return None, f"{last_error}Please wait a minute and try again. Free tier allows 15 requests/min. If this keeps happening, check your API key billing at aistudio.google.com."
@@ -56,11 +117,9 @@ def parse_ai_response(raw_text):
     """Try to parse JSON from AI response, handling markdown code fences."""
     text = raw_text.strip()
     # Strip markdown code fences if present
-    if text.startswith("```"):
-        lines = text.split("\n")
-        # Remove first line (```json) and last line (```)
-        lines = [l for l in lines if not l.strip().startswith("```")]
-        text = "\n".join(lines)
+    match = _FENCE_RE.match(text)
+    if match:
+        text = match.group(1)
     try:
         return json.loads(text)
     except json.JSONDecodeError:
@@ -86,37 +145,7 @@ def analyze_product():
         flash('Gemini API key not configured. Go to Settings to add it.', 'warning')
         return redirect(url_for('ai_assistant.index'))
 
-    prompt = f"""You are a business intelligence analyst specializing in Indian B2B markets.
-
-Analyze this product: "{product}"
-
-Return a JSON object (no markdown, just raw JSON) with these keys:
-
-{{
-  "product_name": "{product}",
-  "market_rating": <number 1-10>,
-  "market_summary": "<2-3 sentence summary of market potential in India>",
-  "strengths": ["<strength 1>", "<strength 2>", "<strength 3>"],
-  "improvements": [
-    {{"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"}},
-    {{"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"}},
-    {{"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"}},
-    {{"title": "<suggestion title>", "detail": "<1-2 sentence explanation>"}}
-  ],
-  "target_industries": ["<industry 1>", "<industry 2>", "<industry 3>", "<industry 4>"],
-  "lead_search_queries": [
-    "<Google search query to find buyers/suppliers 1>",
-    "<Google search query to find buyers/suppliers 2>",
-    "<Google search query to find buyers/suppliers 3>",
-    "<Google search query to find buyers/suppliers 4>",
-    "<Google search query to find buyers/suppliers 5>"
-  ],
-  "email_pitch": "<Short 3-4 sentence cold email pitch for this product>",
-  "pricing_insight": "<1-2 sentence insight about typical pricing or market rates>"
-}}
-
-Focus on the Indian market. Make the search queries specific and useful for finding real business contacts (include words like 'email', 'contact', 'supplier', 'buyer', 'India').
-Return ONLY valid JSON, no extra text."""
+    prompt = PRODUCT_ANALYSIS_PROMPT.substitute(product=product)
 
     raw_response, error = get_gemini_response(prompt, gemini_key)
     if error:
@@ -1,4 +1,5 @@
 import os
+import shutil
 import uuid
 from flask import (Blueprint, render_template, request, redirect, url_for,
                    flash, current_app, send_from_directory)
@@ -7,28 +8,50 @@ from app_package.models import Brochure
 
 brochures_bp = Blueprint('brochures', __name__)
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+BROCHURES_PER_PAGE = 24  # six rows of the four-column grid
 
-def allowed_brochure(filename):
-    if '.' not in filename:
-        return False
-    ext = filename.rsplit('.', 1)[1].lower()
+# Leading bytes of each allowed brochure type, keyed by extension
+BROCHURE_SIGNATURES = {
+    'pdf': (b'%PDF-',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+}
+BROCHURE_SIGNATURE_LENGTH = 8
+
+
+def brochure_extension(filename):
+    """Return the lower-cased extension of filename, or '' if it has none."""
+    _, dot, ext = filename.rpartition('.')
+    return ext.lower() if dot else ''
+
+
+def allowed_brochure(ext):
     return ext in current_app.config['ALLOWED_BROCHURE_EXTENSIONS']
 
 
-def validate_mime(file_stream):
-    try:
-        import magic
-        mime = magic.from_buffer(file_stream.read(2048), mime=True)
-        file_stream.seek(0)
-        return mime in current_app.config['ALLOWED_BROCHURE_MIMETYPES']
-    except ImportError:
-        # python-magic not available, skip MIME check
-        return True
+def validate_mime(file_stream, ext):
+    """Check the file starts with the signature expected for its extension."""
+    head = file_stream.read(BROCHURE_SIGNATURE_LENGTH)
+    file_stream.seek(0)
+    return head.startswith(BROCHURE_SIGNATURES.get(ext, ()))
+
+
+def _clear_default(keep_id=None):
+    """Unset the current default brochure, touching only rows that are default."""
+    query = db.session.query(Brochure).filter(Brochure.is_default.is_(True))
+    if keep_id is not None:
+        query = query.filter(Brochure.id != keep_id)
+    query.update({Brochure.is_default: False})
 
 
 @brochures_bp.route('/')
 def list_brochures():
-    brochures = db.session.query(Brochure).order_by(Brochure.created_at.desc()).all()
+    page = request.args.get('page', 1, type=int)
+    brochures = (db.session.query(Brochure)
+                 .order_by(Brochure.created_at.desc(), Brochure.id.desc())
+                 .paginate(page=page, per_page=BROCHURES_PER_PAGE, error_out=False))
     return render_template('brochures/list.html', brochures=brochures)
 
 
@@ -40,24 +63,25 @@ def upload():
             flash('Please select a file.', 'error')
             return redirect(url_for('brochures.upload'))
 
-        if not allowed_brochure(file.filename):
+        ext = brochure_extension(file.filename)
+        if not allowed_brochure(ext):
             flash('Only PDF, PNG, and JPG files are allowed.', 'error')
             return redirect(url_for('brochures.upload'))
 
-        if not validate_mime(file):
+        if not validate_mime(file.stream, ext):
             flash('File MIME type is not allowed.', 'error')
             return redirect(url_for('brochures.upload'))
 
-        ext = file.filename.rsplit('.', 1)[1].lower()
         stored_name = f"{uuid.uuid4().hex}.{ext}"
         save_path = os.path.join(current_app.config['BROCHURE_FOLDER'], stored_name)
-        file.save(save_path)
-
-        file_size = os.path.getsize(save_path)
+        # Copy in 1 MB chunks and take the size from the write position
+        with open(save_path, 'wb') as out:
+            shutil.copyfileobj(file.stream, out, length=UPLOAD_CHUNK_SIZE)
+            file_size = out.tell()
 
         is_default = request.form.get('is_default') == 'on'
         if is_default:
-            db.session.query(Brochure).update({Brochure.is_default: False})
+            _clear_default()
 
         brochure = Brochure(
             original_filename=file.filename,
@@ -78,8 +102,8 @@ def upload():
 
 @brochures_bp.route('/set-default/<int:brochure_id>', methods=['POST'])
 def set_default(brochure_id):
-    db.session.query(Brochure).update({Brochure.is_default: False})
     brochure = db.get_or_404(Brochure, brochure_id)
+    _clear_default(keep_id=brochure.id)
     brochure.is_default = True
     db.session.commit()
     flash(f'"{brochure.original_filename}" set as default brochure.', 'success')
@@ -2,25 +2,74 @@ import os
 import uuid
 import csv
 import io
+import json
+import logging
+import threading
+import time
 from flask import (Blueprint, render_template, request, redirect, url_for,
-                   flash, jsonify, current_app, send_file)
+                   flash, jsonify, current_app, Response, stream_with_context)
 from app_package import db
 from app_package.models import Contact, MessageLog
 import pandas as pd
 
 contacts_bp = Blueprint('contacts', __name__)
 
+logger = logging.getLogger(__name__)
+
 CONTACT_CATEGORIES = [
     'Manufacturer', 'Exporter', 'Trader', 'Wholesaler',
     'Retailer', 'Distributor', 'Supplier', 'Service Provider', 'Other'
 ]
 CONTACT_STATUSES = ['new', 'contacted', 'responded', 'converted', 'inactive']
+CONTACTS_PER_PAGE = 50
+
+# Columns written by the CSV export, streamed in batches of EXPORT_BATCH_SIZE
+EXPORT_COLUMNS = (
+    Contact.company_name, Contact.contact_person, Contact.email, Contact.phone,
+    Contact.whatsapp, Contact.website, Contact.city, Contact.state, Contact.country,
+    Contact.category, Contact.status, Contact.notes,
+)
+EXPORT_BATCH_SIZE = 1000
+
+# Header of an uploaded file, saved next to it by the preview step
+COLUMNS_SUFFIX = '.columns.json'
+
+# Background import progress, keyed by job id. Finished jobs are kept for
+# IMPORT_JOB_TTL seconds so the status page can still show the result.
+_import_jobs = {}
+IMPORT_JOB_TTL = 3600
+
+# Rows per INSERT batch when importing contacts from CSV/Excel
+IMPORT_BATCH_SIZE = 5000
+# Cell values read as empty on CSV import: pandas' default NA tokens, which
+# the importer treated as blanks when it parsed files with pandas
+IMPORT_NA_VALUES = frozenset({
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a',
+    'nan', 'null',
+})
+# Values for empty or unmapped columns on import
+IMPORT_FIELD_DEFAULTS = {
+    'contact_person': '', 'email': '', 'phone': '', 'whatsapp': '', 'website': '',
+    'city': '', 'state': '', 'country': 'India', 'category': 'Other', 'notes': '',
+}
 
 
 @contacts_bp.route('/')
 def list_contacts():
-    contacts = db.session.query(Contact).order_by(Contact.created_at.desc()).all()
-    return render_template('contacts/list.html', contacts=contacts,
+    page = request.args.get('page', 1, type=int)
+    search = request.args.get('q', '').strip()
+
+    query = db.session.query(Contact)
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(db.or_(Contact.company_name.ilike(pattern),
+                                    Contact.contact_person.ilike(pattern),
+                                    Contact.email.ilike(pattern),
+                                    Contact.city.ilike(pattern)))
+    contacts = (query.order_by(Contact.created_at.desc(), Contact.id.desc())
+                .paginate(page=page, per_page=CONTACTS_PER_PAGE, error_out=False))
+    return render_template('contacts/list.html', contacts=contacts, search=search,
                            categories=CONTACT_CATEGORIES, statuses=CONTACT_STATUSES)
 
 
@@ -75,6 +124,7 @@ def edit_contact(contact_id):
 @contacts_bp.route('/delete/<int:contact_id>', methods=['POST'])
 def delete_contact(contact_id):
     contact = db.get_or_404(Contact, contact_id)
+    db.session.query(MessageLog).filter_by(contact_id=contact.id).delete()
     db.session.delete(contact)
     db.session.commit()
     flash('Contact deleted.', 'success')
@@ -90,20 +140,24 @@ def detail(contact_id):
 
 @contacts_bp.route('/export')
 def export_csv():
-    contacts = db.session.query(Contact).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Company Name', 'Contact Person', 'Email', 'Phone', 'WhatsApp',
-                     'Website', 'City', 'State', 'Country', 'Category', 'Status', 'Notes'])
-    for c in contacts:
-        writer.writerow([c.company_name, c.contact_person, c.email, c.phone, c.whatsapp,
-                         c.website, c.city, c.state, c.country, c.category, c.status, c.notes])
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+    def generate():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['Company Name', 'Contact Person', 'Email', 'Phone', 'WhatsApp',
+                         'Website', 'City', 'State', 'Country', 'Category', 'Status', 'Notes'])
+        rows = db.session.execute(
+            db.select(*EXPORT_COLUMNS).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for batch in rows.partitions():
+            writer.writerows(batch)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+        yield output.getvalue()
+
+    return Response(
+        stream_with_context(generate()),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name='contacts_export.csv'
+        headers={'Content-Disposition': 'attachment; filename=contacts_export.csv'}
     )
 
 
@@ -128,11 +182,15 @@ def import_csv():
         # Read columns
         try:
             if ext == 'csv':
-                df = pd.read_csv(temp_path, nrows=5)
+                # Same reader as the import itself, so mapped names match
+                columns, preview = _csv_preview(temp_path, nrows=5)
             else:
                 df = pd.read_excel(temp_path, nrows=5)
-            columns = df.columns.tolist()
-            preview = df.head(5).to_dict('records')
+                columns = df.columns.tolist()
+                preview = df.head(5).to_dict('records')
+            # Keep the header so the process step needn't open the file again
+            with open(temp_path + COLUMNS_SUFFIX, 'w') as f:
+                json.dump([str(col) for col in columns], f)
         except Exception as e:
             flash(f'Error reading file: {e}', 'error')
             os.remove(temp_path)
@@ -162,13 +220,18 @@ def import_process():
 
     ext = temp_file.rsplit('.', 1)[-1].lower()
     try:
-        if ext == 'csv':
-            df = pd.read_csv(temp_path)
-        else:
-            df = pd.read_excel(temp_path)
-    except Exception as e:
-        flash(f'Error reading file: {e}', 'error')
-        return redirect(url_for('contacts.import_csv'))
+        with open(temp_path + COLUMNS_SUFFIX) as f:
+            columns = json.load(f)
+    except (OSError, ValueError):
+        # Uploaded before the header was saved alongside; read it from the file
+        try:
+            if ext == 'csv':
+                columns = _csv_preview(temp_path, nrows=0)[0]
+            else:
+                columns = [str(col) for col in pd.read_excel(temp_path, nrows=0).columns]
+        except Exception as e:
+            flash(f'Error reading file: {e}', 'error')
+            return redirect(url_for('contacts.import_csv'))
 
     # Build column mapping from form
     mapping = {}
@@ -176,54 +239,157 @@ def import_process():
         if key.startswith('map_') and request.form[key]:
             db_field = key[4:]
             csv_col = request.form[key]
-            if csv_col in df.columns:
+            if csv_col in columns:
                 mapping[db_field] = csv_col
 
     if 'company_name' not in mapping:
         flash('Company Name mapping is required.', 'error')
         return redirect(url_for('contacts.import_csv'))
 
-    count = 0
-    duplicates = 0
-    for _, row in df.iterrows():
-        company = str(row.get(mapping['company_name'], '')).strip()
-        if not company or company == 'nan':
-            continue
-
-        email = str(row.get(mapping.get('email', ''), '')).strip()
-        if email == 'nan':
-            email = ''
-
-        # Duplicate check by company name + email
-        existing = db.session.query(Contact).filter_by(company_name=company).first()
-        if existing:
-            duplicates += 1
-            continue
-
-        contact = Contact(
-            company_name=company,
-            contact_person=str(row.get(mapping.get('contact_person', ''), '')).strip().replace('nan', ''),
-            email=email,
-            phone=str(row.get(mapping.get('phone', ''), '')).strip().replace('nan', ''),
-            whatsapp=str(row.get(mapping.get('whatsapp', ''), '')).strip().replace('nan', ''),
-            website=str(row.get(mapping.get('website', ''), '')).strip().replace('nan', ''),
-            city=str(row.get(mapping.get('city', ''), '')).strip().replace('nan', ''),
-            state=str(row.get(mapping.get('state', ''), '')).strip().replace('nan', ''),
-            country=str(row.get(mapping.get('country', ''), 'India')).strip().replace('nan', '') or 'India',
-            category=str(row.get(mapping.get('category', ''), 'Other')).strip().replace('nan', '') or 'Other',
-            notes=str(row.get(mapping.get('notes', ''), '')).strip().replace('nan', ''),
-            source='csv'
-        )
-        db.session.add(contact)
-        count += 1
+    # Parsing and inserting large files outlives a request, so run it in the
+    # background and let the status page poll for progress
+    _prune_import_jobs()
+    job_id = uuid.uuid4().hex
+    _import_jobs[job_id] = {'status': 'running', 'total': 0, 'processed': 0,
+                            'imported': 0, 'duplicates': 0, 'error': ''}
+    app = current_app._get_current_object()
+    thread = threading.Thread(target=_run_import,
+                              args=(app, job_id, temp_path, ext, mapping))
+    thread.start()
 
-    db.session.commit()
+    return redirect(url_for('contacts.import_status', job_id=job_id))
 
-    # Clean up temp file
-    try:
-        os.remove(temp_path)
-    except OSError:
-        pass
 
-    flash(f'Imported {count} contacts. {duplicates} duplicates skipped.', 'success')
-    return redirect(url_for('contacts.list_contacts'))
+@contacts_bp.route('/import/status/<job_id>')
+def import_status(job_id):
+    if job_id not in _import_jobs:
+        flash('Import not found.', 'error')
+        return redirect(url_for('contacts.import_csv'))
+    return render_template('contacts/import_status.html', job_id=job_id)
+
+
+@contacts_bp.route('/import/progress/<job_id>')
+def import_progress(job_id):
+    job = _import_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(job)
+
+
+def _prune_import_jobs():
+    """Forget imports that finished more than IMPORT_JOB_TTL seconds ago."""
+    cutoff = time.monotonic() - IMPORT_JOB_TTL
+    for job_id, job in list(_import_jobs.items()):
+        if job.get('finished_at', cutoff) < cutoff:
+            _import_jobs.pop(job_id, None)
+
+
+def _import_fields(mapping):
+    """(field, column) pairs of the mapping that are contact columns."""
+    return [(field, col) for field, col in mapping.items()
+            if field == 'company_name' or field in IMPORT_FIELD_DEFAULTS]
+
+
+def _csv_preview(temp_path, nrows):
+    """Header and first ``nrows`` rows of a CSV, read as _csv_records reads it.
+
+    Raises ValueError for blank or repeated column names, which DictReader
+    can't tell apart.
+    """
+    with open(temp_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = reader.fieldnames or []
+        if any(not col.strip() for col in columns):
+            raise ValueError('every column needs a name in the header row')
+        repeated = sorted({col for col in columns if columns.count(col) > 1})
+        if repeated:
+            raise ValueError(f'repeated column names: {", ".join(repeated)}')
+        rows = [row for _, row in zip(range(nrows), reader)]
+    return columns, rows
+
+
+def _csv_records(temp_path, mapping):
+    """Stream cleaned contact dicts from a CSV file, one row at a time."""
+    fields = _import_fields(mapping)
+    with open(temp_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            record = {**IMPORT_FIELD_DEFAULTS, 'source': 'csv'}
+            for field, col in fields:
+                value = (row.get(col) or '').strip()
+                if value not in IMPORT_NA_VALUES:
+                    record[field] = value
+            record.setdefault('company_name', '')
+            yield record
+
+
+def _excel_records(temp_path, mapping):
+    """Cleaned contact dicts from an Excel file, parsed with pandas."""
+    # Parse only the mapped columns, as text (no numeric inference on phones)
+    df = pd.read_excel(temp_path, usecols=list(set(mapping.values())), dtype=str)
+
+    # Clean the mapped columns once per column rather than once per cell
+    df = pd.DataFrame({field: df[col] for field, col in _import_fields(mapping)})
+    df = df.fillna('').astype(str)
+    for field in df.columns:
+        df[field] = df[field].str.strip()
+    for field, default in IMPORT_FIELD_DEFAULTS.items():
+        if field in df:
+            df[field] = df[field].replace('', default)
+        else:
+            df[field] = default
+    df['source'] = 'csv'
+    # Zipping plain column lists is several times faster than to_dict('records')
+    columns = df.columns.tolist()
+    return [dict(zip(columns, values))
+            for values in zip(*(df[col].tolist() for col in columns))]
+
+
+def _run_import(app, job_id, temp_path, ext, mapping):
+    """Parse, clean and insert an uploaded contacts file, recording progress."""
+    job = _import_jobs[job_id]
+    with app.app_context():
+        try:
+            if ext == 'csv':
+                records = _csv_records(temp_path, mapping)
+            else:
+                records = _excel_records(temp_path, mapping)
+                job['total'] = len(records)
+
+            # Duplicate check by company name, against the DB and within the file
+            existing = set(db.session.execute(db.select(Contact.company_name)).scalars())
+
+            # Bulk insert skips building ORM objects for every row
+            batch = []
+            for record in records:
+                job['processed'] += 1
+                company = record['company_name']
+                if not company:
+                    continue
+                if company in existing:
+                    job['duplicates'] += 1
+                    continue
+                existing.add(company)
+                batch.append(record)
+                if len(batch) == IMPORT_BATCH_SIZE:
+                    db.session.execute(db.insert(Contact), batch)
+                    job['imported'] += len(batch)
+                    batch = []
+            if batch:
+                db.session.execute(db.insert(Contact), batch)
+                job['imported'] += len(batch)
+            db.session.commit()
+            job['status'] = 'done'
+        except Exception as e:
+            db.session.rollback()
+            logger.error('Contact import %s failed: %s', job_id, e)
+            job['imported'] = 0
+            job['error'] = str(e)
+            job['status'] = 'failed'
+        finally:
+            job['finished_at'] = time.monotonic()
+            # Clean up temp file and its saved header
+            for path in (temp_path, temp_path + COLUMNS_SUFFIX):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -1,53 +1,84 @@
+import time
 from flask import Blueprint, render_template
 from app_package import db
 from app_package.models import Contact, MessageLog, Brochure, SearchLog, ScheduledJob
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import func
+from sqlalchemy import bindparam, func, select
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Dashboard counters keyed by today's start: {today: (stats, expires_at)}
+_STATS_CACHE = {}
+_STATS_CACHE_TTL = 5  # seconds
+
+# Count statements are built once; the view only binds today's start
+_contact_counts_stmt = select(
+    func.count(),
+    func.count().filter(Contact.created_at >= bindparam('today')),
+    select(func.count()).select_from(Brochure).scalar_subquery(),
+).select_from(Contact)
+_sent_counts_stmt = select(
+    MessageLog.channel,
+    func.count(),
+    func.count().filter(MessageLog.sent_at >= bindparam('today')),
+).where(MessageLog.status == 'sent').group_by(MessageLog.channel)
+# The template shows each message's company, so join it in rather than
+# lazy-loading one contact per row
+_recent_messages_stmt = (
+    select(MessageLog)
+    .options(db.joinedload(MessageLog.contact).load_only(Contact.company_name))
+    .order_by(MessageLog.created_at.desc())
+    .limit(10)
+)
+_recent_searches_stmt = select(SearchLog).order_by(SearchLog.created_at.desc()).limit(5)
+_status_counts_stmt = select(Contact.status, func.count(Contact.id)).group_by(Contact.status)
+
+
+def _dashboard_stats(today):
+    """Counters for the dashboard cards, cached for a few seconds."""
+    cached = _STATS_CACHE.get(today)
+    if cached is not None and cached[1] > time.monotonic():
+        return cached[0]
+
+    params = {'today': today}
+    total_contacts, new_contacts_today, brochure_count = db.session.execute(
+        _contact_counts_stmt, params).one()
+
+    # Sent totals and today's sends for every channel in one query
+    sent = {channel: (total, today_count) for channel, total, today_count
+            in db.session.execute(_sent_counts_stmt, params)}
+    emails_sent, emails_today = sent.get('email', (0, 0))
+    whatsapp_sent, whatsapp_today = sent.get('whatsapp', (0, 0))
+
+    # Contact status breakdown
+    status_counts = dict(db.session.execute(_status_counts_stmt).all())
+
+    stats = {
+        'total_contacts': total_contacts,
+        'new_contacts_today': new_contacts_today,
+        'emails_sent': emails_sent,
+        'emails_today': emails_today,
+        'whatsapp_sent': whatsapp_sent,
+        'whatsapp_today': whatsapp_today,
+        'brochure_count': brochure_count,
+        'status_counts': status_counts,
+    }
+    _STATS_CACHE.clear()  # drop yesterday's entry
+    _STATS_CACHE[today] = (stats, time.monotonic() + _STATS_CACHE_TTL)
+    return stats
+
 
 @dashboard_bp.route('/')
 def index():
-    total_contacts = db.session.query(Contact).count()
-    new_contacts_today = db.session.query(Contact).filter(
-        Contact.created_at >= datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
-    ).count()
-
-    emails_sent = db.session.query(MessageLog).filter_by(channel='email', status='sent').count()
-    emails_today = db.session.query(MessageLog).filter(
-        MessageLog.channel == 'email',
-        MessageLog.status == 'sent',
-        MessageLog.sent_at >= datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
-    ).count()
-
-    whatsapp_sent = db.session.query(MessageLog).filter_by(channel='whatsapp', status='sent').count()
-    whatsapp_today = db.session.query(MessageLog).filter(
-        MessageLog.channel == 'whatsapp',
-        MessageLog.status == 'sent',
-        MessageLog.sent_at >= datetime.now(timezone.utc).replace(hour=0, minute=0, second=0)
-    ).count()
-
-    brochure_count = db.session.query(Brochure).count()
-
-    recent_messages = db.session.query(MessageLog).order_by(MessageLog.created_at.desc()).limit(10).all()
-    recent_searches = db.session.query(SearchLog).order_by(SearchLog.created_at.desc()).limit(5).all()
-    scheduled_jobs = db.session.query(ScheduledJob).all()
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    stats = _dashboard_stats(today)
 
-    # Contact status breakdown
-    status_counts = db.session.query(
-        Contact.status, func.count(Contact.id)
-    ).group_by(Contact.status).all()
+    recent_messages = db.session.scalars(_recent_messages_stmt).all()
+    recent_searches = db.session.scalars(_recent_searches_stmt).all()
+    scheduled_jobs = db.session.query(ScheduledJob).all()
 
     return render_template('dashboard.html',
-                           total_contacts=total_contacts,
-                           new_contacts_today=new_contacts_today,
-                           emails_sent=emails_sent,
-                           emails_today=emails_today,
-                           whatsapp_sent=whatsapp_sent,
-                           whatsapp_today=whatsapp_today,
-                           brochure_count=brochure_count,
                            recent_messages=recent_messages,
                            recent_searches=recent_searches,
                            scheduled_jobs=scheduled_jobs,
-                           status_counts=dict(status_counts))
+                           **stats)
@@ -1,18 +1,25 @@
 """Deal Tracker — monitors classifieds (CarDekho, OLX, Quikr) for user-defined searches."""
+import functools
 import json
 import re
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from urllib.parse import quote_plus
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sqlalchemy import func
 from flask import (Blueprint, render_template, request, redirect, url_for,
                    flash, current_app)
 
 from app_package import db
 from app_package.models import (DealTracker, DealListing, AppSetting,
-                                EnquirySearch, EnquiryResult)
+                                EnquirySearch, EnquiryResult, LISTING_DESCRIPTION_MAX)
 
 deal_tracker_bp = Blueprint('deal_tracker', __name__,
                             template_folder='../templates')
@@ -26,6 +33,44 @@ HEADERS = {
     'Accept-Language': 'en-IN,en;q=0.9',
 }
 
+# Shared session: scrapes and SerpAPI calls reuse pooled keep-alive
+# connections instead of a fresh TCP+TLS handshake per request
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10, pool_maxsize=20,
+    max_retries=Retry(total=2, backoff_factor=0.3,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',), raise_on_status=False),
+))
+
+# SerpAPI responses keyed by query params: {key: (data, expires_at)}.
+# Written from concurrent tracker checks, so eviction and inserts hold the lock.
+_SERPAPI_CACHE = {}
+_SERPAPI_CACHE_LOCK = threading.Lock()
+SERPAPI_CACHE_TTL = 600  # seconds
+SERPAPI_CACHE_MAX = 512
+
+# CarDekho slug URLs that 404'd, so the next check goes straight to the
+# search fallback: {(query_slug, city_slug, category): expires_at}
+_CARDEKHO_404_SLUGS = {}
+_CARDEKHO_404_LOCK = threading.Lock()
+CARDEKHO_404_TTL = 86400  # seconds
+CARDEKHO_404_MAX = 1024
+
+# Listing cards sit near the top of the page; don't download or parse the
+# rest of multi-MB infinite-scroll pages. OLX gets more room because its
+# fallback reads the __NEXT_DATA__ script near the end of the document.
+HTML_READ_LIMIT = 1024 * 1024
+OLX_HTML_READ_LIMIT = 4 * 1024 * 1024
+HTML_CHUNK_SIZE = 64 * 1024
+
+# Trackers scraped at once by check_all / the daily check
+TRACKER_CHECK_WORKERS = 8
+
+# Alerts sent from request handlers; one worker so pywhatkit sends don't
+# overlap and alerts go out in order
+_ALERT_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='deal-alert')
+
 CATEGORY_CHOICES = [
     ('cars', 'Cars'),
     ('bikes', 'Bikes'),
@@ -42,6 +87,31 @@ PLATFORM_CHOICES = [
     ('serpapi', 'SerpAPI (Recommended)'),
 ]
 
+# Listing text patterns, compiled once for the scraping loops
+CARDEKHO_PRICE_PATTERN = re.compile(r'(?:Rs?\s*|Rs\.\s*|\u20b9\s*)[\d,.]+\s*(?:Lakh|lakh)?')
+CARDEKHO_LOCATION_PATTERN = re.compile(r'cars-([A-Za-z-]+?)_')
+SERPAPI_PRICE_PATTERN = re.compile(
+    r'(?:Rs?\s*\.?\s*|INR\s*|\u20b9\s*)[\d,]+(?:\s*(?:Lakh|lakh|L|Cr|cr))?')
+NON_NUMERIC_PATTERN = re.compile(r'[^\d.]')
+# Indian price units ("Lakh", "Cr"/"Crore"); checked in order
+PRICE_UNIT_MULTIPLIERS = (('lakh', 100000), ('cr', 10000000))
+WHITESPACE_PATTERN = re.compile(r'\s+')
+POSTED_DATE_PATTERN = re.compile(
+    r'(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*\s+\d{4})',
+    re.IGNORECASE)
+# Result URL host -> platform tag, for SerpAPI listings and social enquiries
+LISTING_PLATFORM_PATTERN = re.compile(r'olx\.in|quikr\.com|cardekho\.com', re.IGNORECASE)
+LISTING_PLATFORM_TAGS = {'olx.in': 'olx', 'quikr.com': 'quikr', 'cardekho.com': 'cardekho'}
+SOCIAL_PLATFORM_PATTERN = re.compile(
+    r'facebook\.com|instagram\.com|twitter\.com|x\.com', re.IGNORECASE)
+SOCIAL_PLATFORM_TAGS = {'facebook.com': 'facebook', 'instagram.com': 'instagram',
+                        'twitter.com': 'twitter', 'x.com': 'twitter'}
+OLX_INITIAL_DATA_PATTERN = re.compile(r'"initialData"\s*:\s*(?=\{)')
+
+_JSON_DECODER = json.JSONDecoder()
+
+ENQUIRY_RESULTS_PER_PAGE = 20
+
 ENQUIRY_PLATFORM_CHOICES = [
     ('facebook', 'Facebook'),
     ('instagram', 'Instagram'),
@@ -68,30 +138,65 @@ CARDEKHO_CITY_SLUGS = {
 }
 
 # Kerala cities for location filtering
-KERALA_CITIES = {
+KERALA_CITIES = frozenset({
     'thiruvananthapuram', 'trivandrum', 'kochi', 'ernakulam', 'kozhikode',
     'calicut', 'thrissur', 'kollam', 'palakkad', 'alappuzha', 'kannur',
     'kottayam', 'malappuram', 'pathanamthitta', 'idukki', 'wayanad',
     'kasaragod', 'kattappana', 'perumbavoor', 'angamaly', 'aluva',
     'changanassery', 'thodupuzha', 'munnar', 'guruvayur', 'kodungallur',
-}
+})
 
 # Map state names to their known cities (for filtering)
 STATE_CITIES = {
     'kerala': KERALA_CITIES,
 }
 
+LOCATION_TOKEN_PATTERN = re.compile(r'[\s,]+')
+
 
 # ---------------------------------------------------------------------------
 #  Scraping helpers
 # ---------------------------------------------------------------------------
 
+@functools.lru_cache(maxsize=1024)
+def _normalize(value):
+    """Lowercase a location string and treat dashes as spaces."""
+    return value.lower().replace('-', ' ').strip()
+
+
+@functools.lru_cache(maxsize=1024)
+def _location_tokens(loc_lower):
+    return frozenset(LOCATION_TOKEN_PATTERN.split(loc_lower))
+
+
+def _get_html(url, limit=HTML_READ_LIMIT, **kwargs):
+    """GET a page and return at most ``limit`` bytes of its body.
+
+    Error statuses raise ``requests.HTTPError`` as with raise_for_status().
+    Returns bytes so BeautifulSoup can pick the encoding from the page's
+    own meta tag.
+    """
+    resp = _SESSION.get(url, headers=HEADERS, stream=True, **kwargs)
+    chunks = []
+    size = 0
+    try:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(HTML_CHUNK_SIZE):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                break
+    finally:
+        resp.close()
+    return b''.join(chunks)[:limit]
+
+
 def _is_location_match(location, city_input):
     """Check if a listing's location matches the user's requested city/state."""
     if not location:
         return True  # no location info, include by default
-    loc_lower = location.lower().replace('-', ' ')
-    city_lower = city_input.lower().strip()
+    loc_lower = _normalize(location)
+    city_lower = _normalize(city_input)
 
     # Direct city match
     if city_lower in loc_lower or loc_lower in city_lower:
@@ -100,7 +205,8 @@ def _is_location_match(location, city_input):
     # State-level: check if listing city is within the requested state
     state_cities = STATE_CITIES.get(city_lower)
     if state_cities:
-        return loc_lower in state_cities or any(c in loc_lower for c in state_cities)
+        return (loc_lower in state_cities
+                or not state_cities.isdisjoint(_location_tokens(loc_lower)))
 
     return False
 
@@ -120,26 +226,43 @@ def scrape_cardekho(query, city='mumbai', category='cars'):
         # For non-vehicle categories, CarDekho won't help
         return listings
 
+    fallback_url = f'https://www.cardekho.com/used-cars+in+{city_slug}/{quote_plus(query)}'
+    slug_key = (query_slug, city_slug, category)
+    now = time.monotonic()
+    expires = _CARDEKHO_404_SLUGS.get(slug_key)
+    if expires is not None and expires > now:
+        url = fallback_url
+
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=20)
-        if resp.status_code == 404:
-            # Try generic search URL
-            encoded = quote_plus(query)
-            url = f'https://www.cardekho.com/used-cars+in+{city_slug}/{encoded}'
-            resp = requests.get(url, headers=HEADERS, timeout=20)
-        resp.raise_for_status()
+        try:
+            html = _get_html(url, timeout=20)
+        except requests.HTTPError as e:
+            if url == fallback_url or e.response is None or e.response.status_code != 404:
+                raise
+            # Try generic search URL, and remember the slug URL is dead
+            with _CARDEKHO_404_LOCK:
+                if len(_CARDEKHO_404_SLUGS) >= CARDEKHO_404_MAX:
+                    _CARDEKHO_404_SLUGS.pop(next(iter(_CARDEKHO_404_SLUGS)), None)
+                _CARDEKHO_404_SLUGS[slug_key] = now + CARDEKHO_404_TTL
+            url = fallback_url
+            html = _get_html(url, timeout=20)
     except Exception as e:
         logger.warning('CarDekho request failed: %s', e)
         return listings
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
+    soup = BeautifulSoup(html, 'lxml')
 
     # Parse listing links
-    link_els = soup.select('a[href*="/used-car-details/"]')
+    link_els = soup.select('a[href*="/used-car-details/"]', limit=30)
     if not link_els:
-        link_els = soup.select('a[href*="/used-bike-details/"]')
+        link_els = soup.select('a[href*="/used-bike-details/"]', limit=30)
+
+    # Several links (title, image, "view details") usually share one card;
+    # stringify each card subtree once rather than once per link.
+    card_texts = {}
+    seen_hrefs = set()
 
-    for a in link_els[:30]:
+    for a in link_els:
         title = a.get_text(strip=True)
         if not title or len(title) < 5:
             continue
@@ -147,6 +270,9 @@ def scrape_cardekho(query, city='mumbai', category='cars'):
         href = a.get('href', '')
         if href.startswith('/'):
             href = 'https://www.cardekho.com' + href
+        if href in seen_hrefs:
+            continue
+        seen_hrefs.add(href)
 
         # Walk up to find enclosing card for price/image
         card = a.parent
@@ -155,15 +281,20 @@ def scrape_cardekho(query, city='mumbai', category='cars'):
                 card = card.parent
 
         # Extract price from card text
-        card_text = card.get_text(' ', strip=True) if card else ''
+        if card is None:
+            card_text = ''
+        elif id(card) in card_texts:
+            card_text = card_texts[id(card)]
+        else:
+            card_text = card_texts[id(card)] = card.get_text(' ', strip=True)
         price = ''
-        price_match = re.search(r'(?:Rs?\s*|Rs\.\s*|\u20b9\s*)[\d,.]+\s*(?:Lakh|lakh)?', card_text)
+        price_match = CARDEKHO_PRICE_PATTERN.search(card_text)
         if price_match:
             price = price_match.group(0)
 
         # Extract location from URL
         location = ''
-        loc_match = re.search(r'cars-([A-Za-z-]+?)_', href)
+        loc_match = CARDEKHO_LOCATION_PATTERN.search(href)
         if loc_match:
             location = loc_match.group(1).replace('-', ' ').title()
 
@@ -189,6 +320,23 @@ def scrape_cardekho(query, city='mumbai', category='cars'):
     return listings
 
 
+def _olx_next_data_items(raw):
+    """Return the listing items from OLX's __NEXT_DATA__ script text.
+
+    Only the ``initialData`` object is decoded; the rest of the blob
+    (translations, config, experiments) is skipped. Falls back to a full
+    parse if the key can't be located.
+    """
+    match = OLX_INITIAL_DATA_PATTERN.search(raw)
+    if match:
+        initial_data, _ = _JSON_DECODER.raw_decode(raw, match.end())
+    else:
+        initial_data = (json.loads(raw).get('props', {})
+                                       .get('pageProps', {})
+                                       .get('initialData', {}))
+    return initial_data.get('data', [])
+
+
 def scrape_olx(query, city='mumbai'):
     """Scrape OLX India search results."""
     listings = []
@@ -199,13 +347,12 @@ def scrape_olx(query, city='mumbai'):
         params['city'] = city.lower()
 
     try:
-        resp = requests.get(url, headers=HEADERS, params=params, timeout=15)
-        resp.raise_for_status()
+        html = _get_html(url, OLX_HTML_READ_LIMIT, params=params, timeout=15)
     except Exception as e:
         logger.warning('OLX request failed: %s', e)
         return listings
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
+    soup = BeautifulSoup(html, 'lxml')
 
     # OLX renders listing cards as <li> with data-aut-id="itemBox"
     cards = soup.select('[data-aut-id="itemBox"]')
@@ -214,11 +361,7 @@ def scrape_olx(query, city='mumbai'):
         script = soup.find('script', id='__NEXT_DATA__')
         if script:
             try:
-                data = json.loads(script.string)
-                items = (data.get('props', {})
-                             .get('pageProps', {})
-                             .get('initialData', {})
-                             .get('data', []))
+                items = _olx_next_data_items(script.string)
                 for item in items[:30]:
                     title = item.get('title', '')
                     price_obj = item.get('price', {})
@@ -227,7 +370,7 @@ def scrape_olx(query, city='mumbai'):
                     location_name = ''
                     if isinstance(loc, dict):
                         location_name = loc.get('ADMIN_LEVEL_3_name', '') or loc.get('ADMIN_LEVEL_1_name', '')
-                    item_url = 'https://www.olx.in/item/' + item.get('id', '') + '-' + re.sub(r'\s+', '-', title.lower()[:60])
+                    item_url = 'https://www.olx.in/item/' + item.get('id', '') + '-' + WHITESPACE_PATTERN.sub('-', title.lower()[:60])
                     image = ''
                     images = item.get('images', [])
                     if images:
@@ -240,7 +383,7 @@ def scrape_olx(query, city='mumbai'):
                         'image_url': image,
                         'description': item.get('description', ''),
                     })
-            except (json.JSONDecodeError, KeyError, TypeError):
+            except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
                 pass
         return listings
 
@@ -286,13 +429,12 @@ def scrape_quikr(query, city='mumbai', category='other'):
         url = f'https://www.quikr.com/search?city={city.lower()}&q={encoded}'
 
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=20)
-        resp.raise_for_status()
+        html = _get_html(url, timeout=20)
     except Exception as e:
         logger.warning('Quikr request failed: %s', e)
         return listings
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
+    soup = BeautifulSoup(html, 'lxml')
 
     # Quikr listing cards
     cards = soup.select('.snb-tile, .list-view-item, [data-testid="listing-card"]')
@@ -326,6 +468,102 @@ def scrape_quikr(query, city='mumbai', category='other'):
     return listings
 
 
+def _serpapi_get(params, timeout):
+    """Call the SerpAPI search endpoint, returning its JSON or None on failure.
+
+    Successful responses are cached for SERPAPI_CACHE_TTL seconds, so repeated
+    checks of the same query don't spend API quota.
+    """
+    key = tuple(sorted((k, v) for k, v in params.items() if k != 'api_key'))
+    now = time.monotonic()
+    cached = _SERPAPI_CACHE.get(key)
+    if cached is not None and cached[1] > now:
+        return cached[0]
+
+    resp = _SESSION.get('https://serpapi.com/search', params=params, timeout=timeout)
+    if resp.status_code != 200:
+        logger.warning('SerpAPI returned %s for query: %s', resp.status_code, params.get('q'))
+        return None
+
+    data = resp.json()
+    if 'error' in data:
+        logger.warning('SerpAPI error: %s', data['error'])
+        return None
+
+    with _SERPAPI_CACHE_LOCK:
+        if len(_SERPAPI_CACHE) >= SERPAPI_CACHE_MAX:
+            # Drop expired entries, then the oldest if still full
+            for stale in [k for k, (_, expires) in _SERPAPI_CACHE.items() if expires <= now]:
+                _SERPAPI_CACHE.pop(stale, None)
+            if len(_SERPAPI_CACHE) >= SERPAPI_CACHE_MAX:
+                _SERPAPI_CACHE.pop(next(iter(_SERPAPI_CACHE)), None)
+        _SERPAPI_CACHE[key] = (data, now + SERPAPI_CACHE_TTL)
+    return data
+
+
+def _serpapi_query(sq, city, serpapi_key):
+    """Run one SerpAPI Google search and parse its organic results into listings."""
+    listings = []
+    try:
+        params = {
+            'engine': 'google',
+            'q': sq,
+            'gl': 'in',
+            'hl': 'en',
+            'num': 15,
+            'api_key': serpapi_key,
+        }
+        data = _serpapi_get(params, timeout=20)
+        if data is None:
+            return listings
+
+        # Parse organic results
+        city_lower = city.lower()
+        city_title = city.title()
+        for result in data.get('organic_results', []):
+            title = result.get('title', '')
+            link = result.get('link', '')
+            snippet = result.get('snippet', '')
+
+            if not title or not link:
+                continue
+
+            # Extract price from title or snippet
+            price = ''
+            combined = f'{title} {snippet}'
+            price_match = SERPAPI_PRICE_PATTERN.search(combined)
+            if price_match:
+                price = price_match.group(0).strip()
+
+            # Extract location from snippet
+            location = ''
+            if city_lower in combined.lower():
+                location = city_title
+
+            # Detect platform from URL
+            platform_match = LISTING_PLATFORM_PATTERN.search(link)
+            platform_tag = (LISTING_PLATFORM_TAGS[platform_match.group(0).lower()]
+                            if platform_match else 'serpapi')
+
+            # Get thumbnail
+            image_url = result.get('thumbnail', '')
+
+            listings.append({
+                'title': title[:500],
+                'price': price,
+                'location': location or city.title(),
+                'url': link,
+                'image_url': image_url,
+                'description': snippet[:500] if snippet else '',
+                'platform_override': platform_tag,
+            })
+
+    except Exception as e:
+        logger.warning('SerpAPI scrape failed for "%s": %s', sq, e)
+
+    return listings
+
+
 def scrape_serpapi(query, city='mumbai', category='other'):
     """Use SerpAPI Google Search to find OLX/Quikr/classifieds listings.
 
@@ -346,75 +584,10 @@ def scrape_serpapi(query, city='mumbai', category='other'):
         f'{query} {city} used price buy sell',
     ]
 
-    for sq in site_queries:
-        try:
-            params = {
-                'engine': 'google',
-                'q': sq,
-                'gl': 'in',
-                'hl': 'en',
-                'num': 15,
-                'api_key': serpapi_key,
-            }
-            resp = requests.get('https://serpapi.com/search', params=params, timeout=20)
-            if resp.status_code != 200:
-                logger.warning('SerpAPI returned %s for query: %s', resp.status_code, sq)
-                continue
-
-            data = resp.json()
-            if 'error' in data:
-                logger.warning('SerpAPI error: %s', data['error'])
-                continue
-
-            # Parse organic results
-            for result in data.get('organic_results', []):
-                title = result.get('title', '')
-                link = result.get('link', '')
-                snippet = result.get('snippet', '')
-
-                if not title or not link:
-                    continue
-
-                # Extract price from title or snippet
-                price = ''
-                combined = f'{title} {snippet}'
-                price_match = re.search(
-                    r'(?:Rs?\s*\.?\s*|INR\s*|\u20b9\s*)[\d,]+(?:\s*(?:Lakh|lakh|L|Cr|cr))?',
-                    combined
-                )
-                if price_match:
-                    price = price_match.group(0).strip()
-
-                # Extract location from snippet
-                location = ''
-                if city.lower() in snippet.lower() or city.lower() in title.lower():
-                    location = city.title()
-
-                # Detect platform from URL
-                platform_tag = 'serpapi'
-                if 'olx.in' in link:
-                    platform_tag = 'olx'
-                elif 'quikr.com' in link:
-                    platform_tag = 'quikr'
-                elif 'cardekho.com' in link:
-                    platform_tag = 'cardekho'
-
-                # Get thumbnail
-                image_url = result.get('thumbnail', '')
-
-                listings.append({
-                    'title': title[:500],
-                    'price': price,
-                    'location': location or city.title(),
-                    'url': link,
-                    'image_url': image_url,
-                    'description': snippet[:500] if snippet else '',
-                    'platform_override': platform_tag,
-                })
-
-        except Exception as e:
-            logger.warning('SerpAPI scrape failed for "%s": %s', sq, e)
-            continue
+    # The queries are independent network calls, so run them side by side
+    with ThreadPoolExecutor(max_workers=len(site_queries)) as pool:
+        for found in pool.map(lambda sq: _serpapi_query(sq, city, serpapi_key), site_queries):
+            listings.extend(found)
 
     # Deduplicate by URL
     seen_urls = set()
@@ -427,77 +600,163 @@ def scrape_serpapi(query, city='mumbai', category='other'):
     return unique
 
 
-def check_tracker(tracker):
-    """Run a scrape for a single DealTracker. Returns list of newly saved DealListings."""
+# Platform scrapers, all called as scraper(query, city, category)
+PLATFORM_SCRAPERS = {
+    'serpapi': scrape_serpapi,
+    'cardekho': scrape_cardekho,
+    'olx': lambda query, city, category: scrape_olx(query, city),
+    'quikr': scrape_quikr,
+}
+
+
+def _scrape_tracker(app, platforms, query, city, category):
+    """Run every platform scraper for one tracker concurrently.
+
+    Takes plain values rather than the tracker so it can run off the
+    request thread; each worker gets its own app context (and DB session)
+    for settings lookups.
+    """
+    def scrape(platform):
+        with app.app_context():
+            return PLATFORM_SCRAPERS[platform](query, city, category)
+
+    with ThreadPoolExecutor(max_workers=max(len(platforms), 1)) as pool:
+        return list(pool.map(scrape, platforms))
+
+
+def _platforms_json(platforms):
+    """Serialise a platform selection in one canonical (sorted, de-duplicated) form."""
+    return json.dumps(sorted(set(platforms)))
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_price(price_text):
+    """Turn a listing price like "Rs 5.5 Lakh" into rupees, or None."""
+    numeric = NON_NUMERIC_PATTERN.sub('', price_text).strip('.')
+    if not numeric:
+        return None
+    try:
+        val = float(numeric)
+    except ValueError:
+        return None
+    lowered = price_text.lower()
+    for unit, multiplier in PRICE_UNIT_MULTIPLIERS:
+        if unit in lowered:
+            val *= multiplier
+            break
+    return int(val)
+
+
+def _tracker_scrape_args(tracker):
+    query = (tracker.search_query or '').strip()
+    if not query:
+        # Nothing to search for: skip every platform (and its API quota)
+        return [], query, '', tracker.category
     platforms = json.loads(tracker.platforms) if tracker.platforms else ['serpapi']
+    platforms = [p for p in platforms if p in PLATFORM_SCRAPERS]
     city = (tracker.city or 'Mumbai').strip().lower()
+    return platforms, query, city, tracker.category
+
+
+def runnable_trackers():
+    """Active trackers that have a search query to run."""
+    return (db.session.query(DealTracker)
+            .filter(DealTracker.is_active.is_(True),
+                    func.trim(DealTracker.search_query) != '')
+            .all())
+
+
+def check_tracker(tracker):
+    """Run a scrape for a single DealTracker. Returns the newly saved listings as dicts."""
+    app = current_app._get_current_object()
+    platforms, query, city, category = _tracker_scrape_args(tracker)
+    results = _scrape_tracker(app, platforms, query, city, category)
+    return _save_new_listings(tracker, platforms, results)
+
+
+def check_trackers(trackers):
+    """Check several trackers, scraping them concurrently.
+
+    Only the network work runs in worker threads; listings are saved one
+    tracker at a time on the calling thread's session. Returns
+    ``(tracker, new_listings)`` pairs, skipping trackers that failed.
+    """
+    app = current_app._get_current_object()
+    checked = []
+    if not trackers:
+        return checked
+
+    with ThreadPoolExecutor(max_workers=min(TRACKER_CHECK_WORKERS, len(trackers))) as pool:
+        scrape_args = [_tracker_scrape_args(t) for t in trackers]
+        futures = [pool.submit(_scrape_tracker, app, *args) for args in scrape_args]
+        for tracker, args, future in zip(trackers, scrape_args, futures):
+            try:
+                new = _save_new_listings(tracker, args[0], future.result())
+                checked.append((tracker, new))
+            except Exception as e:
+                db.session.rollback()
+                logger.error('Deal check failed for tracker %s: %s', tracker.id, e)
+    return checked
+
+
+def _save_new_listings(tracker, platforms, results):
+    """Store scraped items that aren't already saved for the tracker."""
     new_listings = []
+    min_price, max_price = tracker.min_price, tracker.max_price
 
-    for platform in platforms:
-        if platform == 'serpapi':
-            raw = scrape_serpapi(tracker.search_query, city, tracker.category)
-        elif platform == 'cardekho':
-            raw = scrape_cardekho(tracker.search_query, city, tracker.category)
-        elif platform == 'olx':
-            raw = scrape_olx(tracker.search_query, city)
-        elif platform == 'quikr':
-            raw = scrape_quikr(tracker.search_query, city, tracker.category)
-        else:
-            continue
+    # Duplicate check: fetch every already-saved URL in one query
+    candidate_urls = {item.get('url', '').strip() for raw in results for item in raw}
+    candidate_urls.discard('')
+    seen = set()
+    if candidate_urls:
+        seen = set(db.session.execute(
+            db.select(DealListing.url).where(DealListing.tracker_id == tracker.id,
+                                             DealListing.url.in_(candidate_urls))
+        ).scalars())
 
+    for platform, raw in zip(platforms, results):
         for item in raw:
             item_url = item.get('url', '').strip()
-            if not item_url:
-                continue
-
-            # Duplicate check
-            exists = db.session.query(DealListing).filter_by(
-                tracker_id=tracker.id, url=item_url
-            ).first()
-            if exists:
+            if not item_url or item_url in seen:
                 continue
+            seen.add(item_url)
 
             # Price filter (extract numeric value in lakhs or absolute)
-            if tracker.min_price or tracker.max_price:
-                price_text = item.get('price', '')
-                numeric = re.sub(r'[^\d.]', '', price_text)
-                if numeric:
-                    val = float(numeric)
-                    # If price mentions "Lakh", convert to absolute
-                    if 'lakh' in price_text.lower():
-                        val = val * 100000
-                    val = int(val)
-                    if tracker.min_price and val < tracker.min_price:
+            if min_price or max_price:
+                val = _parse_price(item.get('price', ''))
+                if val is not None:
+                    if min_price and val < min_price:
                         continue
-                    if tracker.max_price and val > tracker.max_price:
+                    if max_price and val > max_price:
                         continue
 
             # SerpAPI results may override platform based on actual URL
             actual_platform = item.get('platform_override', platform)
 
-            listing = DealListing(
-                tracker_id=tracker.id,
-                title=item.get('title', '')[:500],
-                price=item.get('price', '')[:100],
-                location=item.get('location', '')[:200],
-                url=item_url[:1000],
-                image_url=item.get('image_url', '')[:1000],
-                platform=actual_platform,
-                description=item.get('description', ''),
-                is_new=True,
-            )
-            db.session.add(listing)
-            new_listings.append(listing)
+            new_listings.append({
+                'tracker_id': tracker.id,
+                'title': item.get('title', '')[:500],
+                'price': item.get('price', '')[:100],
+                'location': item.get('location', '')[:200],
+                'url': item_url[:1000],
+                'image_url': item.get('image_url', '')[:1000],
+                'platform': actual_platform,
+                'description': item.get('description', '')[:LISTING_DESCRIPTION_MAX],
+                'is_new': True,
+            })
 
+    # One executemany INSERT instead of an ORM object per listing
+    if new_listings:
+        db.session.execute(db.insert(DealListing), new_listings)
     tracker.last_checked = datetime.now(timezone.utc)
     db.session.commit()
     return new_listings
 
 
-def send_deal_alert(tracker, new_listings):
-    """Send WhatsApp alert for new deal listings."""
+def _deal_alert(tracker, new_listings):
+    """Build the (phone, message) WhatsApp alert for new listings, or None."""
     if not tracker.whatsapp_number or not new_listings:
-        return
+        return None
 
     phone = tracker.whatsapp_number.strip()
     if not phone.startswith('+'):
@@ -506,18 +765,20 @@ def send_deal_alert(tracker, new_listings):
     lines = [f'\U0001f514 Deal Alert: {tracker.search_query}\n']
     lines.append(f'{len(new_listings)} new listing(s) found in {tracker.city}:\n')
     for i, listing in enumerate(new_listings[:10], 1):
-        lines.append(f'{i}. {listing.title} - {listing.price}')
-        if listing.location:
-            lines.append(f'   \U0001f4cd {listing.location}')
-        if listing.url:
-            lines.append(f'   \U0001f517 {listing.url}')
+        lines.append(f'{i}. {listing["title"]} - {listing["price"]}')
+        if listing['location']:
+            lines.append(f'   \U0001f4cd {listing["location"]}')
+        if listing['url']:
+            lines.append(f'   \U0001f517 {listing["url"]}')
         lines.append('')
 
     if len(new_listings) > 10:
         lines.append(f'... and {len(new_listings) - 10} more.')
 
-    message = '\n'.join(lines)
+    return phone, '\n'.join(lines)
+
 
+def _send_alert_whatsapp(phone, message):
     try:
         from app_package.routes.whatsapp_sender import send_whatsapp_pywhatkit, send_whatsapp_twilio
         wa_mode = AppSetting.get('whatsapp_mode', 'pywhatkit')
@@ -529,6 +790,31 @@ def send_deal_alert(tracker, new_listings):
         logger.error('Deal alert WhatsApp failed: %s', e)
 
 
+def send_deal_alert(tracker, new_listings):
+    """Send WhatsApp alert for new deal listings."""
+    alert = _deal_alert(tracker, new_listings)
+    if alert:
+        _send_alert_whatsapp(*alert)
+
+
+def queue_deal_alert(tracker, new_listings):
+    """Send the deal alert in the background so a request doesn't wait on WhatsApp.
+
+    The message is built here, from the caller's session; the worker only
+    needs an app context for the WhatsApp mode setting.
+    """
+    alert = _deal_alert(tracker, new_listings)
+    if not alert:
+        return
+    app = current_app._get_current_object()
+
+    def send():
+        with app.app_context():
+            _send_alert_whatsapp(*alert)
+
+    _ALERT_EXECUTOR.submit(send)
+
+
 # ---------------------------------------------------------------------------
 #  Routes
 # ---------------------------------------------------------------------------
@@ -536,10 +822,14 @@ def send_deal_alert(tracker, new_listings):
 @deal_tracker_bp.route('/')
 def dashboard():
     trackers = db.session.query(DealTracker).order_by(DealTracker.created_at.desc()).all()
-    # Attach stats
+    # Attach stats — total and new counts for every tracker in one grouped query
+    stats = {tracker_id: (total, new) for tracker_id, total, new in db.session.execute(
+        db.select(DealListing.tracker_id, func.count(),
+                  func.count().filter(DealListing.is_new.is_(True)))
+        .group_by(DealListing.tracker_id)
+    )}
     for t in trackers:
-        t.total_listings = t.listings.count()
-        t.new_listings = t.listings.filter_by(is_new=True).count()
+        t.total_listings, t.new_listings = stats.get(t.id, (0, 0))
     return render_template('deal_tracker/dashboard.html', trackers=trackers)
 
 
@@ -553,7 +843,7 @@ def add_tracker():
             city=request.form.get('city', 'Mumbai').strip(),
             min_price=int(request.form['min_price']) if request.form.get('min_price') else None,
             max_price=int(request.form['max_price']) if request.form.get('max_price') else None,
-            platforms=json.dumps(platforms),
+            platforms=_platforms_json(platforms),
             whatsapp_number=request.form.get('whatsapp_number', '').strip(),
             is_active=True,
         )
@@ -584,7 +874,7 @@ def edit_tracker(tracker_id):
         tracker.city = request.form.get('city', 'Mumbai').strip()
         tracker.min_price = int(request.form['min_price']) if request.form.get('min_price') else None
         tracker.max_price = int(request.form['max_price']) if request.form.get('max_price') else None
-        tracker.platforms = json.dumps(platforms)
+        tracker.platforms = _platforms_json(platforms)
         tracker.whatsapp_number = request.form.get('whatsapp_number', '').strip()
         tracker.is_active = 'is_active' in request.form
         db.session.commit()
@@ -600,6 +890,7 @@ def delete_tracker(tracker_id):
     tracker = db.session.get(DealTracker, tracker_id)
     if tracker:
         name = tracker.search_query
+        db.session.query(DealListing).filter_by(tracker_id=tracker.id).delete()
         db.session.delete(tracker)
         db.session.commit()
         flash(f'Tracker "{name}" deleted.', 'success')
@@ -614,18 +905,28 @@ def results(tracker_id):
         return redirect(url_for('deal_tracker.dashboard'))
 
     page = request.args.get('page', 1, type=int)
-    listings = (tracker.listings
+    listings = (db.session.query(DealListing)
+                .options(db.undefer(DealListing.description))
+                .filter_by(tracker_id=tracker.id)
                 .order_by(DealListing.found_at.desc())
                 .paginate(page=page, per_page=20, error_out=False))
 
-    # Mark viewed listings as not new
-    db.session.query(DealListing).filter_by(
-        tracker_id=tracker_id, is_new=True
-    ).update({'is_new': False})
+    # Render before marking the listings seen: the commit would expire the
+    # loaded rows (reloading each one) and clear their "new" badges
+    html = render_template('deal_tracker/results.html',
+                           tracker=tracker, listings=listings)
+
+    # Plain UPDATE: nothing is read from the session afterwards, so skip
+    # syncing the identity map
+    db.session.execute(
+        db.update(DealListing)
+        .filter_by(tracker_id=tracker.id, is_new=True)
+        .values(is_new=False)
+        .execution_options(synchronize_session=False)
+    )
     db.session.commit()
 
-    return render_template('deal_tracker/results.html',
-                           tracker=tracker, listings=listings)
+    return html
 
 
 @deal_tracker_bp.route('/check/<int:tracker_id>', methods=['POST'])
@@ -637,7 +938,7 @@ def check_single(tracker_id):
 
     new = check_tracker(tracker)
     if new:
-        send_deal_alert(tracker, new)
+        queue_deal_alert(tracker, new)
         flash(f'Found {len(new)} new listing(s) for "{tracker.search_query}".', 'success')
     else:
         flash(f'No new listings found for "{tracker.search_query}".', 'info')
@@ -647,12 +948,11 @@ def check_single(tracker_id):
 
 @deal_tracker_bp.route('/check-all', methods=['POST'])
 def check_all():
-    trackers = db.session.query(DealTracker).filter_by(is_active=True).all()
+    trackers = runnable_trackers()
     total_new = 0
-    for tracker in trackers:
-        new = check_tracker(tracker)
+    for tracker, new in check_trackers(trackers):
         if new:
-            send_deal_alert(tracker, new)
+            queue_deal_alert(tracker, new)
             total_new += len(new)
 
     flash(f'Checked {len(trackers)} tracker(s). Found {total_new} new listing(s) total.', 'success')
@@ -705,14 +1005,8 @@ def search_social_enquiries(query, platforms=None, location=''):
             'num': 30,
             'api_key': serpapi_key,
         }
-        resp = requests.get('https://serpapi.com/search', params=params, timeout=25)
-        if resp.status_code != 200:
-            logger.warning('SerpAPI returned %s for enquiry query', resp.status_code)
-            return []
-
-        data = resp.json()
-        if 'error' in data:
-            logger.warning('SerpAPI error: %s', data['error'])
+        data = _serpapi_get(params, timeout=25)
+        if data is None:
             return []
 
         for item in data.get('organic_results', []):
@@ -724,14 +1018,9 @@ def search_social_enquiries(query, platforms=None, location=''):
                 continue
 
             # Detect platform from URL
-            platform = 'other'
-            link_lower = link.lower()
-            if 'facebook.com' in link_lower:
-                platform = 'facebook'
-            elif 'instagram.com' in link_lower:
-                platform = 'instagram'
-            elif 'twitter.com' in link_lower or 'x.com' in link_lower:
-                platform = 'twitter'
+            platform_match = SOCIAL_PLATFORM_PATTERN.search(link)
+            platform = (SOCIAL_PLATFORM_TAGS[platform_match.group(0).lower()]
+                        if platform_match else 'other')
 
             # Only keep results from requested platforms
             if platform not in platforms and platform != 'other':
@@ -743,17 +1032,14 @@ def search_social_enquiries(query, platforms=None, location=''):
                 author = title.split(' - ')[0].strip()
             elif ' | ' in title:
                 author = title.split(' | ')[0].strip()
-            elif ' on ' in title.lower():
-                parts = title.lower().split(' on ')
-                if len(parts) >= 2:
-                    author = title[:title.lower().index(' on ')].strip()
+            else:
+                on_idx = title.lower().find(' on ')
+                if on_idx != -1:
+                    author = title[:on_idx].strip()
 
             # Extract date from snippet if present
             posted_date = ''
-            date_match = re.search(
-                r'(\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)\w*\s+\d{4})',
-                snippet, re.IGNORECASE
-            )
+            date_match = POSTED_DATE_PATTERN.search(snippet)
             if date_match:
                 posted_date = date_match.group(1)
 
@@ -786,8 +1072,11 @@ def enquiries():
     searches = db.session.query(EnquirySearch).order_by(
         EnquirySearch.created_at.desc()
     ).all()
+    counts = dict(db.session.execute(
+        db.select(EnquiryResult.search_id, func.count()).group_by(EnquiryResult.search_id)
+    ).all())
     for s in searches:
-        s.result_count = s.results.count()
+        s.result_count = counts.get(s.id, 0)
     return render_template('deal_tracker/enquiries.html', searches=searches,
                            platforms=ENQUIRY_PLATFORM_CHOICES)
 
@@ -807,7 +1096,7 @@ def enquiry_search():
         # Create search record
         search = EnquirySearch(
             search_query=query,
-            platforms=json.dumps(platforms),
+            platforms=_platforms_json(platforms),
             location=location,
             status='pending',
         )
@@ -818,25 +1107,26 @@ def enquiry_search():
         try:
             raw_results = search_social_enquiries(query, platforms, location)
 
+            # The search row is brand new, so the only possible duplicates
+            # are repeats within this result set
+            seen = set()
+            rows = []
             for item in raw_results:
-                # Duplicate check within this search
-                exists = db.session.query(EnquiryResult).filter_by(
-                    search_id=search.id, url=item['url']
-                ).first()
-                if exists:
+                if item['url'] in seen:
                     continue
-
-                result = EnquiryResult(
-                    search_id=search.id,
-                    title=item['title'],
-                    snippet=item['snippet'],
-                    url=item['url'],
-                    platform=item['platform'],
-                    author=item['author'],
-                    posted_date=item['posted_date'],
-                    image_url=item.get('image_url', ''),
-                )
-                db.session.add(result)
+                seen.add(item['url'])
+                rows.append({
+                    'search_id': search.id,
+                    'title': item['title'],
+                    'snippet': item['snippet'],
+                    'url': item['url'],
+                    'platform': item['platform'],
+                    'author': item['author'],
+                    'posted_date': item['posted_date'],
+                    'image_url': item.get('image_url', ''),
+                })
+            if rows:
+                db.session.execute(db.insert(EnquiryResult), rows)
 
             search.total_found = len(raw_results)
             search.status = 'completed'
@@ -864,24 +1154,49 @@ def enquiry_results(search_id):
         flash('Search not found.', 'warning')
         return redirect(url_for('deal_tracker.enquiries'))
 
-    page = request.args.get('page', 1, type=int)
     platform_filter = request.args.get('platform', '')
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
 
-    query = search.results.order_by(EnquiryResult.found_at.desc())
+    # Keyset pagination on id (newest first): results are inserted in the
+    # order they were found, so id order matches found_at and there's no
+    # COUNT or OFFSET. Fetch one extra row to know if another page exists.
+    query = db.session.query(EnquiryResult).filter_by(search_id=search.id)
     if platform_filter:
         query = query.filter_by(platform=platform_filter)
 
-    results = query.paginate(page=page, per_page=20, error_out=False)
+    if before is not None:
+        results = (query.filter(EnquiryResult.id > before)
+                   .order_by(EnquiryResult.id.asc())
+                   .limit(ENQUIRY_RESULTS_PER_PAGE + 1).all())
+        has_newer = len(results) > ENQUIRY_RESULTS_PER_PAGE
+        results = results[:ENQUIRY_RESULTS_PER_PAGE][::-1]
+        # The cursor can be any id, so check rather than assume older rows exist
+        has_older = bool(results) and db.session.query(
+            query.filter(EnquiryResult.id < results[-1].id).exists()).scalar()
+    else:
+        page_query = query
+        if after is not None:
+            page_query = query.filter(EnquiryResult.id < after)
+        results = (page_query.order_by(EnquiryResult.id.desc())
+                   .limit(ENQUIRY_RESULTS_PER_PAGE + 1).all())
+        has_older = len(results) > ENQUIRY_RESULTS_PER_PAGE
+        results = results[:ENQUIRY_RESULTS_PER_PAGE]
+        has_newer = after is not None and bool(results) and db.session.query(
+            query.filter(EnquiryResult.id > results[0].id).exists()).scalar()
 
     return render_template('deal_tracker/enquiry_results.html',
                            search=search, results=results,
-                           platform_filter=platform_filter)
+                           platform_filter=platform_filter,
+                           newer_cursor=results[0].id if results and has_newer else None,
+                           older_cursor=results[-1].id if results and has_older else None)
 
 
 @deal_tracker_bp.route('/enquiries/delete/<int:search_id>', methods=['POST'])
 def delete_enquiry(search_id):
     search = db.session.get(EnquirySearch, search_id)
     if search:
+        db.session.query(EnquiryResult).filter_by(search_id=search.id).delete()
         db.session.delete(search)
         db.session.commit()
         flash('Enquiry search deleted.', 'success')
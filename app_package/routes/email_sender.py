@@ -1,20 +1,39 @@
+import base64
+import functools
+import logging
 import os
 import smtplib
-import threading
+import socket
 import time
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage, MIMEPart
+from email.utils import formataddr
 from datetime import datetime, timezone, timedelta
 from flask import (Blueprint, render_template, request, redirect, url_for,
                    flash, current_app, jsonify)
 from jinja2 import Template
+from sqlalchemy import func
 from app_package import db
 from app_package.models import Contact, MessageLog, Brochure, AppSetting
 
+logger = logging.getLogger(__name__)
+
 email_bp = Blueprint('email', __name__)
 
+# Contacts listed on the compose page; narrow further with ?q=
+COMPOSE_CONTACTS_LIMIT = 100
+
+# Re-check the hourly/daily quota this often during a batch, in case another
+# batch or the scheduled job is sending at the same time
+RATE_RECHECK_EVERY = 10
+# Commit sent/failed statuses in groups rather than after every email
+LOG_COMMIT_EVERY = 25
+
+# Batches run one at a time on a single worker, so concurrent submissions
+# queue up instead of each opening its own SMTP connection, and the send
+# pacing holds across batches
+_EMAIL_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='email-send')
+
 EMAIL_TEMPLATES = {
     'brochure_intro': {
         'name': 'Product Introduction',
@@ -58,22 +77,126 @@ EMAIL_TEMPLATES = {
     }
 }
 
+# Compiled once at import; a batch renders the same template per contact
+_COMPILED_TEMPLATES = {
+    key: (Template(tpl['subject']), Template(tpl['body']))
+    for key, tpl in EMAIL_TEMPLATES.items()
+}
+
 
 def get_smtp_config():
+    settings = AppSetting.get_many({
+        'smtp_host': 'smtp.gmail.com',
+        'smtp_port': '587',
+        'smtp_username': '',
+        'smtp_password': '',
+        'smtp_from_email': '',
+        'smtp_from_name': '',
+    })
     return {
-        'host': AppSetting.get('smtp_host', 'smtp.gmail.com'),
-        'port': int(AppSetting.get('smtp_port', '587')),
-        'username': AppSetting.get('smtp_username', ''),
-        'password': AppSetting.get('smtp_password', ''),
-        'from_email': AppSetting.get('smtp_from_email', ''),
-        'from_name': AppSetting.get('smtp_from_name', ''),
+        'host': settings['smtp_host'],
+        'port': int(settings['smtp_port']),
+        'username': settings['smtp_username'],
+        'password': settings['smtp_password'],
+        'from_email': settings['smtp_from_email'],
+        'from_name': settings['smtp_from_name'],
     }
 
 
-def send_single_email(contact, subject, html_body, brochure=None, smtp_config=None):
-    """Send a single email. Returns (success, error_message)."""
+def _enable_keepalive(sock):
+    """Turn on TCP keepalive so NAT/firewalls don't drop the idle gaps between sends."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Linux-only knobs: first probe after 60s idle, then every 15s
+    if hasattr(socket, 'TCP_KEEPIDLE'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60)
+    if hasattr(socket, 'TCP_KEEPINTVL'):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15)
+
+
+class SmtpSession:
+    """One authenticated SMTP connection reused for a batch of sends.
+
+    Connects on the first message, reconnects if the server has dropped
+    the connection, and cycles it after ``max_per_session`` messages so
+    providers with per-connection limits don't cut us off.
+    """
+
+    def __init__(self, smtp_config, max_per_session=None):
+        self.smtp_config = smtp_config
+        if max_per_session is None:
+            max_per_session = current_app.config['SMTP_MAX_PER_SESSION']
+        self.max_per_session = max_per_session
+        self._server = None
+        self._sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _connect(self):
+        self.close()
+        server = smtplib.SMTP(self.smtp_config['host'], self.smtp_config['port'], timeout=30)
+        try:
+            _enable_keepalive(server.sock)
+            server.starttls()
+            server.login(self.smtp_config['username'], self.smtp_config['password'])
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self._sent = 0
+
+    def send_message(self, msg):
+        if self._server is None or self._sent >= self.max_per_session:
+            self._connect()
+        try:
+            self._server.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Idle connection timed out between sends; retry once on a fresh one
+            self._connect()
+            self._server.send_message(msg)
+        self._sent += 1
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except smtplib.SMTPException:
+            self._server.close()
+        except OSError:
+            pass
+        self._server = None
+
+
+def load_attachment(brochure):
+    """Read and base64-encode a brochure file once so a batch can reuse it.
+
+    Returns ``(payload, filename)``, or None if the file is missing.
+    """
+    brochure_path = os.path.join(
+        current_app.config['BROCHURE_FOLDER'], brochure.stored_filename
+    )
+    if not os.path.exists(brochure_path):
+        return None
+    with open(brochure_path, 'rb') as f:
+        payload = base64.encodebytes(f.read()).decode('ascii')
+    return payload, brochure.original_filename
+
+
+def send_single_email(contact, subject, html_body, brochure=None, smtp_config=None,
+                      session=None, attachment=None):
+    """Send a single email. Returns (success, error_message).
+
+    Pass an open SmtpSession to send over an existing connection; otherwise
+    one is opened and closed for this message. Batches should pass the
+    brochure as a pre-encoded ``attachment`` from load_attachment() rather
+    than re-reading the file for every contact.
+    """
     if not smtp_config:
-        smtp_config = get_smtp_config()
+        smtp_config = session.smtp_config if session else get_smtp_config()
 
     if not smtp_config['username'] or not smtp_config['password']:
         return False, 'SMTP not configured'
@@ -82,32 +205,33 @@ def send_single_email(contact, subject, html_body, brochure=None, smtp_config=No
         return False, 'Contact has no email'
 
     try:
-        msg = MIMEMultipart()
-        msg['From'] = f"{smtp_config['from_name']} <{smtp_config['from_email']}>" if smtp_config['from_name'] else smtp_config['from_email']
+        msg = EmailMessage()
+        msg['From'] = formataddr((smtp_config['from_name'], smtp_config['from_email'])) if smtp_config['from_name'] else smtp_config['from_email']
         msg['To'] = contact.email
         msg['Subject'] = subject
 
-        msg.attach(MIMEText(html_body, 'html'))
+        msg.set_content(html_body, subtype='html', cte='quoted-printable')
 
         # Attach brochure if provided
-        if brochure:
-            brochure_path = os.path.join(
-                current_app.config['BROCHURE_FOLDER'], brochure.stored_filename
-            )
-            if os.path.exists(brochure_path):
-                with open(brochure_path, 'rb') as f:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(f.read())
-                    encoders.encode_base64(part)
-                    part.add_header('Content-Disposition',
-                                    f'attachment; filename="{brochure.original_filename}"')
-                    msg.attach(part)
-
-        server = smtplib.SMTP(smtp_config['host'], smtp_config['port'], timeout=30)
-        server.starttls()
-        server.login(smtp_config['username'], smtp_config['password'])
-        server.send_message(msg)
-        server.quit()
+        if attachment is None and brochure:
+            attachment = load_attachment(brochure)
+        if attachment:
+            # The payload is already base64, so build the part by hand
+            # rather than add_attachment(), which would encode it again
+            payload, filename = attachment
+            part = MIMEPart()
+            part['Content-Type'] = 'application/octet-stream'
+            part['Content-Transfer-Encoding'] = 'base64'
+            part.add_header('Content-Disposition', 'attachment', filename=filename)
+            part.set_payload(payload)
+            msg.make_mixed()
+            msg.attach(part)
+
+        if session is not None:
+            session.send_message(msg)
+        else:
+            with SmtpSession(smtp_config, max_per_session=1) as single:
+                single.send_message(msg)
         return True, ''
     except Exception as e:
         return False, str(e)
@@ -115,10 +239,17 @@ def send_single_email(contact, subject, html_body, brochure=None, smtp_config=No
 
 def render_email_template(template_key, context):
     """Render an email template with given context."""
-    tpl = EMAIL_TEMPLATES.get(template_key, {})
-    subject = Template(tpl.get('subject', '')).render(**context)
-    body = Template(tpl.get('body', '')).render(**context)
-    return subject, body
+    compiled = _COMPILED_TEMPLATES.get(template_key)
+    if compiled is None:
+        return '', ''
+    subject_tpl, body_tpl = compiled
+    return subject_tpl.render(**context), body_tpl.render(**context)
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_template(source):
+    """Compile a user-supplied template string, reusing it across a batch."""
+    return Template(source)
 
 
 def get_rate_limit_status():
@@ -127,30 +258,71 @@ def get_rate_limit_status():
     hour_ago = now - timedelta(hours=1)
     day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    sent_this_hour = db.session.query(MessageLog).filter(
-        MessageLog.channel == 'email',
-        MessageLog.status == 'sent',
-        MessageLog.sent_at >= hour_ago
-    ).count()
-
-    sent_today = db.session.query(MessageLog).filter(
-        MessageLog.channel == 'email',
-        MessageLog.status == 'sent',
-        MessageLog.sent_at >= day_start
-    ).count()
+    # Both counts in one scan of the (channel, status, sent_at) index
+    sent_this_hour, sent_today = db.session.execute(
+        db.select(func.count().filter(MessageLog.sent_at >= hour_ago),
+                  func.count().filter(MessageLog.sent_at >= day_start))
+        .where(MessageLog.channel == 'email',
+               MessageLog.status == 'sent',
+               MessageLog.sent_at >= min(hour_ago, day_start))
+    ).one()
 
     return sent_this_hour, sent_today
 
 
+def rate_limit_reached():
+    """True once the hourly or daily email quota is used up."""
+    sent_hour, sent_day = get_rate_limit_status()
+    return (sent_hour >= current_app.config['EMAIL_RATE_PER_HOUR']
+            or sent_day >= current_app.config['EMAIL_RATE_PER_DAY'])
+
+
+class SendPacer:
+    """Keeps sends at least ``interval`` seconds apart, start to start.
+
+    Time spent building and sending a message counts towards the gap, so
+    a slow send isn't followed by the full delay again.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next_allowed = time.monotonic()
+
+    def wait(self):
+        now = time.monotonic()
+        if self._next_allowed > now:
+            time.sleep(self._next_allowed - now)
+            now = self._next_allowed
+        self._next_allowed = now + self.interval
+
+
+def _log_batch_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error('Email batch failed: %s', exc, exc_info=exc)
+
+
 @email_bp.route('/')
 @email_bp.route('/compose')
 def compose():
-    contacts = db.session.query(Contact).filter(Contact.email != '', Contact.email.isnot(None)).order_by(Contact.company_name).all()
+    search = request.args.get('q', '').strip()
+    query = (db.session.query(Contact)
+             .options(db.load_only(Contact.id, Contact.company_name, Contact.email))
+             .filter(Contact.email != '', Contact.email.isnot(None)))
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(db.or_(Contact.company_name.ilike(pattern),
+                                    Contact.email.ilike(pattern)))
+    # One extra row tells the template the list was cut off
+    contacts = query.order_by(Contact.company_name).limit(COMPOSE_CONTACTS_LIMIT + 1).all()
+    more_contacts = len(contacts) > COMPOSE_CONTACTS_LIMIT
+    contacts = contacts[:COMPOSE_CONTACTS_LIMIT]
     brochures = db.session.query(Brochure).order_by(Brochure.created_at.desc()).all()
     templates = {k: v['name'] for k, v in EMAIL_TEMPLATES.items()}
     sent_hour, sent_day = get_rate_limit_status()
     return render_template('email/compose.html',
-                           contacts=contacts, brochures=brochures,
+                           contacts=contacts, search=search, more_contacts=more_contacts,
+                           brochures=brochures,
                            templates=templates,
                            sent_hour=sent_hour, sent_day=sent_day,
                            rate_hour=current_app.config['EMAIL_RATE_PER_HOUR'],
@@ -170,42 +342,58 @@ def send():
         return redirect(url_for('email.compose'))
 
     brochure = None
+    attachment = None
     if brochure_id:
         brochure = db.session.get(Brochure, int(brochure_id))
+    if brochure:
+        # Read the file once up front; a missing file fails the whole batch
+        # here instead of every email quietly going out without it
+        attachment = load_attachment(brochure)
+        if attachment is None:
+            flash(f'Brochure file "{brochure.original_filename}" is missing. No emails were sent.', 'error')
+            return redirect(url_for('email.compose'))
 
-    contacts = db.session.query(Contact).filter(Contact.id.in_([int(i) for i in contact_ids])).all()
+    ids = [int(i) for i in contact_ids]
 
     # Check rate limits
     sent_hour, sent_day = get_rate_limit_status()
     remaining_hour = max(0, current_app.config['EMAIL_RATE_PER_HOUR'] - sent_hour)
     remaining_day = max(0, current_app.config['EMAIL_RATE_PER_DAY'] - sent_day)
-    max_sendable = min(remaining_hour, remaining_day, len(contacts))
+    max_sendable = min(remaining_hour, remaining_day, len(ids))
 
     if max_sendable == 0:
         flash('Rate limit reached. Try again later.', 'error')
         return redirect(url_for('email.compose'))
 
-    contacts = contacts[:max_sendable]
+    # Only load the contacts this batch can actually send to
+    contacts = (db.session.query(Contact)
+                .filter(Contact.id.in_(ids))
+                .order_by(Contact.id)
+                .limit(max_sendable)
+                .all())
     smtp_config = get_smtp_config()
 
-    context_base = {
-        'sender_name': AppSetting.get('sender_name', ''),
-        'sender_company': AppSetting.get('sender_company', ''),
-        'sender_phone': AppSetting.get('sender_phone', ''),
-    }
+    context_base = AppSetting.get_many({
+        'sender_name': '',
+        'sender_company': '',
+        'sender_phone': '',
+    })
 
-    # Send in background thread for batch
+    # Send in the background email worker
     app = current_app._get_current_object()
 
     def send_batch():
-        with app.app_context():
+        with app.app_context(), SmtpSession(smtp_config) as session:
+            # Record every message as pending up front in one INSERT, then
+            # commit status updates every LOG_COMMIT_EVERY sends
+            messages = []
             for contact in contacts:
                 ctx = {**context_base,
                        'company_name': contact.company_name,
                        'contact_person': contact.contact_person}
 
                 if custom_subject and custom_body:
-                    subject = Template(custom_subject).render(**ctx)
+                    subject = _compile_template(custom_subject).render(**ctx)
                     body = custom_body
                 else:
                     subject, body = render_email_template(template_key, ctx)
@@ -218,10 +406,23 @@ def send():
                     brochure_id=brochure.id if brochure else None,
                     status='pending'
                 )
-                db.session.add(log)
-                db.session.commit()
-
-                success, error = send_single_email(contact, subject, body, brochure, smtp_config)
+                messages.append((contact, subject, body, log))
+            db.session.add_all([log for _, _, _, log in messages])
+            db.session.commit()
+
+            pacer = SendPacer(app.config['EMAIL_SEND_INTERVAL'])
+            for i, (contact, subject, body, log) in enumerate(messages):
+                if i and i % RATE_RECHECK_EVERY == 0 and rate_limit_reached():
+                    logger.warning('Email rate limit reached; stopped batch after %d of %d',
+                                   i, len(messages))
+                    for _, _, _, unsent in messages[i:]:
+                        unsent.status = 'failed'
+                        unsent.error_message = 'Rate limit reached'
+                    break
+
+                pacer.wait()
+                success, error = send_single_email(contact, subject, body, smtp_config=smtp_config,
+                                                   session=session, attachment=attachment)
                 log.status = 'sent' if success else 'failed'
                 log.error_message = error
                 log.sent_at = datetime.now(timezone.utc) if success else None
@@ -230,11 +431,12 @@ def send():
                 if success and contact.status == 'new':
                     contact.status = 'contacted'
 
-                db.session.commit()
-                time.sleep(3)  # Rate limiting delay between sends
+                if (i + 1) % LOG_COMMIT_EVERY == 0:
+                    db.session.commit()
+            db.session.commit()
 
-    thread = threading.Thread(target=send_batch)
-    thread.start()
+    future = _EMAIL_EXECUTOR.submit(send_batch)
+    future.add_done_callback(_log_batch_failure)
 
     flash(f'Sending emails to {len(contacts)} contacts in background...', 'success')
     return redirect(url_for('email.compose'))
@@ -260,12 +462,25 @@ def test_smtp():
 @email_bp.route('/preview-template', methods=['POST'])
 def preview_template():
     template_key = request.form.get('template', 'brochure_intro')
+    sender = AppSetting.get_many({
+        'sender_name': 'Your Name',
+        'sender_company': 'Your Company',
+        'sender_phone': '+91-XXXXXXXXXX',
+    })
+    subject, body = _render_preview(template_key, tuple(sorted(sender.items())))
+    return jsonify({'subject': subject, 'body': body})
+
+
+@functools.lru_cache(maxsize=32)
+def _render_preview(template_key, sender_items):
+    """Preview a template with sample contact details.
+
+    Only the template and the sender settings vary, so the rendered preview
+    is cached until either changes.
+    """
     ctx = {
         'company_name': 'Sample Spice Co.',
         'contact_person': 'Mr. Sharma',
-        'sender_name': AppSetting.get('sender_name', 'Your Name'),
-        'sender_company': AppSetting.get('sender_company', 'Your Company'),
-        'sender_phone': AppSetting.get('sender_phone', '+91-XXXXXXXXXX'),
+        **dict(sender_items),
     }
-    subject, body = render_email_template(template_key, ctx)
-    return jsonify({'subject': subject, 'body': body})
+    return render_email_template(template_key, ctx)
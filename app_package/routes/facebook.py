@@ -1,22 +1,106 @@
+import functools
+import json
 import re
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timezone
 from flask import (Blueprint, render_template, request, redirect, url_for,
-                   flash, jsonify)
+                   flash, jsonify, g, current_app)
 from app_package import db
 from app_package.models import Contact, AppSetting, FacebookSource
 
 facebook_bp = Blueprint('facebook', __name__)
 
 GRAPH_API = 'https://graph.facebook.com/v18.0'
+GRAPH_BATCH_LIMIT = 50  # requests per Graph API batch call
+FB_SCAN_WORKERS = 8  # feeds scanned concurrently by scan-all / group scans
+
+# Shared session: Graph API calls, including those from concurrent feed
+# scans, reuse pooled keep-alive connections instead of a TLS handshake each
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4, pool_maxsize=FB_SCAN_WORKERS * 2,
+    max_retries=Retry(total=2, backoff_factor=0.3,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',), raise_on_status=False),
+))
+# Contact.source values for leads imported from Facebook
+FB_CONTACT_SOURCES = ('facebook_comment', 'facebook_group', 'facebook_search',
+                      'facebook_page', 'facebook_discover')
+
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}')
+# Indian mobile formats, tried left to right in a single pass over the text
+PHONE_PATTERN = re.compile('|'.join(f'(?:{p})' for p in (
+    r'\+91[\s\-]?\d{5}[\s\-]?\d{5}',
+    r'\+91[\s\-]?\d{10}',
+    r'(?<!\d)0?\d{10}(?!\d)',
+    r'(?<!\d)\d{3}[\s\-]\d{3}[\s\-]\d{4}(?!\d)',
+    r'(?<!\d)\d{5}[\s\-]\d{5}(?!\d)',
+)))
+PHONE_SEPARATOR_PATTERN = re.compile(r'[\s\-]')
+
+ENQUIRY_KEYWORDS = (
+    'need', 'want', 'require', 'looking for', 'interested',
+    'price', 'rate', 'cost', 'quote', 'quotation', 'pricing',
+    'supply', 'supplier', 'provide', 'available', 'availability',
+    'bulk', 'wholesale', 'order', 'buy', 'purchase', 'buying',
+    'contact', 'call me', 'whatsapp', 'msg me', 'dm me', 'inbox me',
+    'send details', 'send info', 'more info', 'details please',
+    'quantity', 'kg', 'ton', 'quintal', 'metric ton',
+    'urgent', 'urgently', 'immediately', 'asap',
+    'dealer', 'distributor', 'manufacturer', 'exporter',
+    'chahiye', 'chaiye', 'mangta', 'dedo', 'bhejo', 'bhejna',
+    'kitna', 'kya rate', 'price batao', 'rate batao',
+    'kharidna', 'lena hai', 'dena hai', 'mil sakta',
+    'contact karo', 'number do', 'phone number',
+)
+
+
+def _keyword_trie_pattern(words):
+    """Build a regex matching any of ``words``, factored by shared prefixes.
+
+    A flat ``a|b|c`` alternation retries every keyword at each position; the
+    trie form only follows branches whose prefix matches, so non-enquiry text
+    is rejected in one scan instead of one substring search per keyword.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def build(node):
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+ENQUIRY_KEYWORD_PATTERN = re.compile(_keyword_trie_pattern(ENQUIRY_KEYWORDS))
 
 
 def get_fb_config():
-    return {
-        'page_id': AppSetting.get('fb_page_id', ''),
-        'access_token': AppSetting.get('fb_access_token', ''),
-        'group_ids': [g.strip() for g in AppSetting.get('fb_group_ids', '').split(',') if g.strip()],
-    }
+    # Every Graph API call needs the token, so build the config once per
+    # request (or scheduler app context) rather than once per call
+    config = getattr(g, '_fb_config', None)
+    if config is None:
+        settings = AppSetting.get_many({
+            'fb_page_id': '', 'fb_access_token': '', 'fb_group_ids': '',
+        })
+        config = g._fb_config = {
+            'page_id': settings['fb_page_id'],
+            'access_token': settings['fb_access_token'],
+            'group_ids': [gid.strip() for gid in settings['fb_group_ids'].split(',') if gid.strip()],
+        }
+    return config
 
 
 def fb_api_get(endpoint, params=None):
@@ -31,7 +115,7 @@ def fb_api_get(endpoint, params=None):
     params['access_token'] = config['access_token']
 
     try:
-        resp = requests.get(url, params=params, timeout=15)
+        resp = _SESSION.get(url, params=params, timeout=15)
         data = resp.json()
         if 'error' in data:
             return None, data['error'].get('message', 'Unknown Facebook API error')
@@ -40,58 +124,84 @@ def fb_api_get(endpoint, params=None):
         return None, str(e)
 
 
+def fb_api_batch(calls):
+    """Make several Graph API GETs in one HTTP request.
+
+    ``calls`` is a list of ``(endpoint, params)`` pairs. Returns a list of
+    ``(data, error)`` tuples in the same order, as fb_api_get would.
+    """
+    config = get_fb_config()
+    if not config['access_token']:
+        return [(None, 'Facebook Access Token not configured. Go to Settings.')] * len(calls)
+
+    results = []
+    for start in range(0, len(calls), GRAPH_BATCH_LIMIT):
+        chunk = calls[start:start + GRAPH_BATCH_LIMIT]
+        batch = [{'method': 'GET',
+                  'relative_url': f"{endpoint}?{urlencode(params or {})}"}
+                 for endpoint, params in chunk]
+        try:
+            resp = _SESSION.post(GRAPH_API, data={
+                'access_token': config['access_token'],
+                'batch': json.dumps(batch),
+                'include_headers': 'false',
+            }, timeout=30)
+            responses = resp.json()
+            if isinstance(responses, dict) and 'error' in responses:
+                error = responses['error'].get('message', 'Unknown Facebook API error')
+                results.extend([(None, error)] * len(chunk))
+                continue
+        except Exception as e:
+            results.extend([(None, str(e))] * len(chunk))
+            continue
+
+        for item in responses:
+            # Individual calls that timed out inside the batch come back as null
+            if not item:
+                results.append((None, 'Facebook batch request timed out'))
+                continue
+            try:
+                data = json.loads(item.get('body') or '{}')
+            except ValueError:
+                results.append((None, 'Invalid response from Facebook'))
+                continue
+            if 'error' in data:
+                results.append((None, data['error'].get('message', 'Unknown Facebook API error')))
+            else:
+                results.append((data, None))
+    return results
+
+
+@functools.lru_cache(maxsize=4096)
 def extract_contact_info(text):
-    """Extract phone numbers and emails from text."""
-    phones = []
-    emails = []
+    """Extract phone numbers and emails from text.
+
+    Cached, since reshared posts repeat the same text; returns tuples so the
+    cached value can't be mutated by a caller.
+    """
     if not text:
-        return phones, emails
-
-    email_pattern = r'[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}'
-    emails = list(set(re.findall(email_pattern, text)))
-    emails = [e for e in emails if 'facebook.com' not in e.lower()]
-
-    phone_patterns = [
-        r'\+91[\s\-]?\d{5}[\s\-]?\d{5}',
-        r'\+91[\s\-]?\d{10}',
-        r'(?<!\d)0?\d{10}(?!\d)',
-        r'(?<!\d)\d{3}[\s\-]\d{3}[\s\-]\d{4}(?!\d)',
-        r'(?<!\d)\d{5}[\s\-]\d{5}(?!\d)',
-    ]
-    for pattern in phone_patterns:
-        found = re.findall(pattern, text)
-        for p in found:
-            cleaned = re.sub(r'[\s\-]', '', p)
-            if len(cleaned) >= 10:
-                phones.append(cleaned)
-
-    phones = list(set(phones))
-    return phones, emails
+        return (), ()
 
+    emails = tuple(e for e in set(EMAIL_PATTERN.findall(text))
+                   if 'facebook.com' not in e.lower())
 
+    phones = set()
+    for p in PHONE_PATTERN.findall(text):
+        cleaned = PHONE_SEPARATOR_PATTERN.sub('', p)
+        if len(cleaned) >= 10:
+            phones.add(cleaned)
+
+    return tuple(phones), emails
+
+
+@functools.lru_cache(maxsize=4096)
 def is_enquiry(text, keyword_filter=None):
     """Check if a comment/post looks like a business enquiry."""
     if not text:
         return False
     text_lower = text.lower()
 
-    enquiry_keywords = [
-        'need', 'want', 'require', 'looking for', 'interested',
-        'price', 'rate', 'cost', 'quote', 'quotation', 'pricing',
-        'supply', 'supplier', 'provide', 'available', 'availability',
-        'bulk', 'wholesale', 'order', 'buy', 'purchase', 'buying',
-        'contact', 'call me', 'whatsapp', 'msg me', 'dm me', 'inbox me',
-        'send details', 'send info', 'more info', 'details please',
-        'quantity', 'kg', 'ton', 'quintal', 'metric ton',
-        'urgent', 'urgently', 'immediately', 'asap',
-        'dealer', 'distributor', 'manufacturer', 'exporter',
-        'chahiye', 'chaiye', 'mangta', 'dedo', 'bhejo', 'bhejna',
-        'kitna', 'kya rate', 'price batao', 'rate batao',
-        'kharidna', 'lena hai', 'dena hai', 'mil sakta',
-        'contact karo', 'number do', 'phone number',
-    ]
-
-    is_enq = any(kw in text_lower for kw in enquiry_keywords)
+    is_enq = ENQUIRY_KEYWORD_PATTERN.search(text_lower) is not None
 
     if keyword_filter:
         keyword_lower = keyword_filter.lower().replace('#', '')
@@ -110,12 +220,6 @@ def _process_comment_or_post(text, author_name, source_label, keyword_filter=Non
     phones, emails = extract_contact_info(text)
     name = author_name or 'Facebook Lead'
 
-    is_dup = db.session.query(Contact).filter(
-        Contact.company_name == name,
-        Contact.source.in_(['facebook_comment', 'facebook_group', 'facebook_search',
-                            'facebook_page', 'facebook_discover'])
-    ).first() is not None
-
     return {
         'name': name,
         'text': text,
@@ -124,39 +228,91 @@ def _process_comment_or_post(text, author_name, source_label, keyword_filter=Non
         'phone': phones[0] if phones else '',
         'email': emails[0] if emails else '',
         'is_enquiry': True,
-        'is_duplicate': is_dup,
+        'is_duplicate': False,  # set for the whole batch by _mark_duplicate_leads
         'source': source_label,
     }
 
 
-def _save_contact_from_lead(name, phone, email, text, source):
-    """Save a single lead as contact. Returns True if saved, False if duplicate."""
-    if not name:
-        return False
-    existing = db.session.query(Contact).filter_by(company_name=name).first()
-    if existing:
-        if phone and not existing.phone:
-            existing.phone = phone
-            existing.whatsapp = phone
-        if email and not existing.email:
-            existing.email = email
-        if text and len(text) > len(existing.notes or ''):
-            existing.notes = f"FB: {text[:500]}"
-        db.session.commit()
-        return False
+def _mark_duplicate_leads(leads):
+    """Flag leads whose name already exists as a Facebook contact, in one query."""
+    names = {lead['name'] for lead in leads}
+    if not names:
+        return
+    existing = set(db.session.execute(
+        db.select(Contact.company_name).where(
+            Contact.company_name.in_(names),
+            Contact.source.in_(FB_CONTACT_SOURCES),
+        )
+    ).scalars())
+    for lead in leads:
+        lead['is_duplicate'] = lead['name'] in existing
 
-    contact = Contact(
-        company_name=name,
-        contact_person=name,
-        phone=phone,
-        whatsapp=phone,
-        email=email,
-        notes=f"FB: {text[:500]}",
-        source=source,
-        category='Other',
-    )
-    db.session.add(contact)
-    return True
+
+def _scan_feeds(feeds, keyword=None):
+    """Scan several ``(fb_id, source_type)`` feeds concurrently.
+
+    Returns ``_scan_source_feed`` results in the same order. Each worker gets
+    its own app context for settings lookups; nothing is written to the DB.
+    """
+    if not feeds:
+        return []
+    app = current_app._get_current_object()
+
+    def scan(feed):
+        with app.app_context():
+            return _scan_source_feed(*feed, keyword)
+
+    with ThreadPoolExecutor(max_workers=min(FB_SCAN_WORKERS, len(feeds))) as pool:
+        return list(pool.map(scan, feeds))
+
+
+def _bulk_save_leads(leads, source=None):
+    """Save leads as contacts. Returns the number of new contacts added.
+
+    Leads whose name already matches a contact fill in that contact's missing
+    phone/email instead. Existing contacts are looked up in one query and new
+    ones are added together; the caller commits. ``source`` overrides each
+    lead's own ``'source'``.
+    """
+    names = {lead['name'] for lead in leads if lead['name']}
+    if not names:
+        return 0
+    contacts = {}
+    for contact in db.session.execute(
+        db.select(Contact).where(Contact.company_name.in_(names)).order_by(Contact.id)
+    ).scalars():
+        contacts.setdefault(contact.company_name, contact)
+
+    new_contacts = []
+    for lead in leads:
+        name, phone, email, text = lead['name'], lead['phone'], lead['email'], lead['text']
+        if not name:
+            continue
+        existing = contacts.get(name)
+        if existing:
+            if phone and not existing.phone:
+                existing.phone = phone
+                existing.whatsapp = phone
+            if email and not existing.email:
+                existing.email = email
+            if text and len(text) > len(existing.notes or ''):
+                existing.notes = f"FB: {text[:500]}"
+            continue
+
+        contact = contacts[name] = Contact(
+            company_name=name,
+            contact_person=name,
+            phone=phone,
+            whatsapp=phone,
+            email=email,
+            notes=f"FB: {text[:500]}",
+            source=source or lead['source'],
+            category='Other',
+        )
+        new_contacts.append(contact)
+
+    db.session.add_all(new_contacts)
+    return len(new_contacts)
 
 
 def _scan_source_feed(fb_id, source_type, keyword=None):
@@ -168,8 +324,10 @@ def _scan_source_feed(fb_id, source_type, keyword=None):
     posts_data, error = fb_api_get(
         endpoint,
         params={
-            'fields': 'id,message,from,created_time,comments.limit(50){message,from,created_time}',
-            'limit': '50'
+            # Nested edge expansion returns each post's comments in the same
+            # response, so pages need no follow-up per-post comment fetches.
+            'fields': 'id,message,from,created_time,comments.limit(100){message,from,created_time}',
+            'limit': '100'
         }
     )
     if error:
@@ -218,38 +376,6 @@ def _scan_source_feed(fb_id, source_type, keyword=None):
                 }
                 leads.append(lead)
 
-    # If page, also try fetching comments separately for more coverage
-    if source_type == 'page':
-        posts_data2, _ = fb_api_get(
-            f"{fb_id}/posts",
-            params={'fields': 'id', 'limit': '25'}
-        )
-        if posts_data2:
-            for post in posts_data2.get('data', []):
-                comments_data, _ = fb_api_get(
-                    f"{post['id']}/comments",
-                    params={'fields': 'id,message,from,created_time', 'limit': '100'}
-                )
-                if not comments_data:
-                    continue
-                for comment in comments_data.get('data', []):
-                    stats['comments'] += 1
-                    text = comment.get('message', '')
-                    commenter = comment.get('from', {}).get('name', '')
-                    if is_enquiry(text, keyword):
-                        # Avoid duplicate leads
-                        if not any(l['name'] == commenter and l['text'][:50] == text[:50] for l in leads):
-                            stats['enquiries'] += 1
-                            phones, emails = extract_contact_info(text)
-                            leads.append({
-                                'name': commenter or 'FB Lead',
-                                'text': text,
-                                'phone': phones[0] if phones else '',
-                                'email': emails[0] if emails else '',
-                                'source': contact_source,
-                                'date': comment.get('created_time', ''),
-                            })
-
     return leads, stats
 
 
@@ -262,21 +388,19 @@ def dashboard():
     has_groups = len(config['group_ids']) > 0
 
     fb_contacts = db.session.query(Contact).filter(
-        Contact.source.in_(['facebook_comment', 'facebook_group', 'facebook_search',
-                            'facebook_page', 'facebook_discover'])
+        Contact.source.in_(FB_CONTACT_SOURCES)
     ).order_by(Contact.created_at.desc()).limit(50).all()
 
-    total_fb = db.session.query(Contact).filter(
-        Contact.source.in_(['facebook_comment', 'facebook_group', 'facebook_search',
-                            'facebook_page', 'facebook_discover'])
-    ).count()
-    from_comments = db.session.query(Contact).filter(
-        Contact.source.in_(['facebook_comment', 'facebook_page'])
-    ).count()
-    from_groups = db.session.query(Contact).filter_by(source='facebook_group').count()
-    from_search = db.session.query(Contact).filter(
-        Contact.source.in_(['facebook_search', 'facebook_discover'])
-    ).count()
+    # All per-source counts in one GROUP BY
+    by_source = dict(db.session.execute(
+        db.select(Contact.source, db.func.count())
+        .where(Contact.source.in_(FB_CONTACT_SOURCES))
+        .group_by(Contact.source)
+    ).all())
+    total_fb = sum(by_source.values())
+    from_comments = by_source.get('facebook_comment', 0) + by_source.get('facebook_page', 0)
+    from_groups = by_source.get('facebook_group', 0)
+    from_search = by_source.get('facebook_search', 0) + by_source.get('facebook_discover', 0)
 
     # Saved sources count
     saved_sources = db.session.query(FacebookSource).filter_by(is_active=True).count()
@@ -305,12 +429,7 @@ def fetch_comments():
     keyword = request.form.get('keyword', '').strip()
     leads, stats = _scan_source_feed(config['page_id'], 'page', keyword or None)
 
-    contacts_saved = 0
-    for lead in leads:
-        if _save_contact_from_lead(lead['name'], lead['phone'], lead['email'],
-                                   lead['text'], 'facebook_comment'):
-            contacts_saved += 1
-
+    contacts_saved = _bulk_save_leads(leads, 'facebook_comment')
     db.session.commit()
 
     flash(f'Scanned {stats["posts"]} posts, {stats["comments"]} comments. '
@@ -337,16 +456,13 @@ def fetch_groups():
     total_posts = 0
     total_comments = 0
 
-    for group_id in config['group_ids']:
-        leads, stats = _scan_source_feed(group_id, 'group', keyword or None)
+    group_scans = _scan_feeds([(group_id, 'group') for group_id in config['group_ids']],
+                              keyword or None)
+    for leads, stats in group_scans:
         total_posts += stats['posts']
         total_comments += stats['comments']
         total_enquiries += stats['enquiries']
-
-        for lead in leads:
-            if _save_contact_from_lead(lead['name'], lead['phone'], lead['email'],
-                                       lead['text'], 'facebook_group'):
-                total_saved += 1
+        total_saved += _bulk_save_leads(leads, 'facebook_group')
 
     db.session.commit()
 
@@ -397,7 +513,7 @@ def discover_pages():
         # Search for places/pages via another method
         flash(f'Page search note: {error}. Try searching manually or use "My Groups" to find your groups.', 'warning')
     else:
-        existing_ids = {s.fb_id for s in db.session.query(FacebookSource).all()}
+        existing_ids = set(db.session.execute(db.select(FacebookSource.fb_id)).scalars())
         for page in data.get('data', []):
             results.append({
                 'fb_id': page.get('id', ''),
@@ -449,7 +565,7 @@ def discover_groups():
     if error:
         flash(f'Group search note: {error}. Try "My Groups" to find groups you\'re already in.', 'warning')
     else:
-        existing_ids = {s.fb_id for s in db.session.query(FacebookSource).all()}
+        existing_ids = set(db.session.execute(db.select(FacebookSource.fb_id)).scalars())
         for group in data.get('data', []):
             results.append({
                 'fb_id': group.get('id', ''),
@@ -492,7 +608,7 @@ def my_groups():
     if error:
         flash(f'Could not fetch groups: {error}', 'warning')
     else:
-        existing_ids = {s.fb_id for s in db.session.query(FacebookSource).all()}
+        existing_ids = set(db.session.execute(db.select(FacebookSource.fb_id)).scalars())
         for group in data.get('data', []):
             results.append({
                 'fb_id': group.get('id', ''),
@@ -564,25 +680,30 @@ def save_multiple_sources():
         flash('No sources selected.', 'error')
         return redirect(url_for('facebook.discover'))
 
-    saved = 0
-    for idx in selected:
-        fb_id = request.form.get(f'fb_id_{idx}', '').strip()
-        name = request.form.get(f'name_{idx}', '').strip()
-        source_type = request.form.get(f'type_{idx}', 'page')
-        category = request.form.get(f'category_{idx}', '')
-        member_count = request.form.get(f'member_count_{idx}', '0')
-        fan_count = request.form.get(f'fan_count_{idx}', '0')
-        about = request.form.get(f'about_{idx}', '')
-        keyword = request.form.get('search_keyword', '')
+    rows = [(idx, request.form.get(f'fb_id_{idx}', '').strip()) for idx in selected]
+    fb_ids = {fb_id for _, fb_id in rows if fb_id}
+    # One lookup for every selected id rather than one per row
+    sources = {s.fb_id: s for s in db.session.execute(
+        db.select(FacebookSource).where(FacebookSource.fb_id.in_(fb_ids))
+    ).scalars()} if fb_ids else {}
+    keyword = request.form.get('search_keyword', '')
 
+    new_sources = []
+    for idx, fb_id in rows:
         if not fb_id:
             continue
 
-        existing = db.session.query(FacebookSource).filter_by(fb_id=fb_id).first()
+        existing = sources.get(fb_id)
         if existing:
             existing.is_active = True
         else:
-            source = FacebookSource(
+            name = request.form.get(f'name_{idx}', '').strip()
+            source_type = request.form.get(f'type_{idx}', 'page')
+            category = request.form.get(f'category_{idx}', '')
+            member_count = request.form.get(f'member_count_{idx}', '0')
+            fan_count = request.form.get(f'fan_count_{idx}', '0')
+            about = request.form.get(f'about_{idx}', '')
+            source = sources[fb_id] = FacebookSource(
                 fb_id=fb_id,
                 name=name,
                 source_type=source_type,
@@ -592,9 +713,10 @@ def save_multiple_sources():
                 fan_count=int(fan_count) if str(fan_count).isdigit() else 0,
                 added_keyword=keyword,
             )
-            db.session.add(source)
-            saved += 1
+            new_sources.append(source)
 
+    db.session.add_all(new_sources)
+    saved = len(new_sources)
     db.session.commit()
     flash(f'Saved {saved} sources for scanning.', 'success')
     return redirect(url_for('facebook.discover'))
@@ -640,12 +762,7 @@ def scan_source(source_id):
         flash(f'Error scanning "{source.name}": {stats["error"]}', 'error')
         return redirect(url_for('facebook.discover'))
 
-    contacts_saved = 0
-    contact_source = 'facebook_page' if source.source_type == 'page' else 'facebook_group'
-    for lead in leads:
-        if _save_contact_from_lead(lead['name'], lead['phone'], lead['email'],
-                                   lead['text'], contact_source):
-            contacts_saved += 1
+    contacts_saved = _bulk_save_leads(leads)
 
     source.last_scanned = datetime.now(timezone.utc)
     source.leads_found += contacts_saved
@@ -670,23 +787,16 @@ def scan_all_sources():
     scanned = 0
     errors = []
 
-    for source in sources:
-        leads, stats = _scan_source_feed(source.fb_id, source.source_type, keyword)
-
+    source_scans = _scan_feeds([(s.fb_id, s.source_type) for s in sources], keyword)
+    for source, (leads, stats) in zip(sources, source_scans):
         if 'error' in stats:
             errors.append(f'{source.name}: {stats["error"]}')
             continue
 
         scanned += 1
         total_enquiries += stats['enquiries']
-        contact_source = 'facebook_page' if source.source_type == 'page' else 'facebook_group'
-
-        saved_this = 0
-        for lead in leads:
-            if _save_contact_from_lead(lead['name'], lead['phone'], lead['email'],
-                                       lead['text'], contact_source):
-                saved_this += 1
-                total_saved += 1
+        saved_this = _bulk_save_leads(leads)
+        total_saved += saved_this
 
         source.last_scanned = datetime.now(timezone.utc)
         source.leads_found += saved_this
@@ -749,14 +859,14 @@ def search():
                                 results.append(lead)
 
         # 2. Search configured groups for keyword
-        for group_id in config['group_ids']:
-            posts_data, _ = fb_api_get(
-                f"{group_id}/feed",
-                params={
-                    'fields': 'id,message,from,comments.limit(30){message,from,created_time},created_time',
-                    'limit': '50'
-                }
-            )
+        group_feeds = fb_api_batch([
+            (f"{group_id}/feed", {
+                'fields': 'id,message,from,comments.limit(30){message,from,created_time},created_time',
+                'limit': '50'
+            })
+            for group_id in config['group_ids']
+        ])
+        for group_id, (posts_data, _) in zip(config['group_ids'], group_feeds):
             if not posts_data:
                 continue
             for post in posts_data.get('data', []):
@@ -784,18 +894,21 @@ def search():
         if config['page_id']:
             scanned_ids.add(config['page_id'])
 
+        sources_to_scan = []
         for source in saved_sources:
             if source.fb_id in scanned_ids:
                 continue
             scanned_ids.add(source.fb_id)
+            sources_to_scan.append(source)
 
-            posts_data, _ = fb_api_get(
-                f"{source.fb_id}/feed" if source.source_type == 'group' else f"{source.fb_id}/posts",
-                params={
-                    'fields': 'id,message,from,comments.limit(30){message,from,created_time},created_time',
-                    'limit': '30'
-                }
-            )
+        source_feeds = fb_api_batch([
+            (f"{source.fb_id}/feed" if source.source_type == 'group' else f"{source.fb_id}/posts", {
+                'fields': 'id,message,from,comments.limit(30){message,from,created_time},created_time',
+                'limit': '30'
+            })
+            for source in sources_to_scan
+        ])
+        for source, (posts_data, _) in zip(sources_to_scan, source_feeds):
             if not posts_data:
                 continue
             for post in posts_data.get('data', []):
@@ -842,6 +955,7 @@ def search():
             if key not in seen:
                 seen.add(key)
                 unique_results.append(r)
+        _mark_duplicate_leads(unique_results)
 
         return render_template('facebook/search_results.html',
                                query=query, results=unique_results)
@@ -856,7 +970,7 @@ def save_leads():
         flash('No leads selected.', 'error')
         return redirect(url_for('facebook.dashboard'))
 
-    saved = 0
+    leads = []
     for idx in selected:
         name = request.form.get(f'name_{idx}', '').strip()
         phone = request.form.get(f'phone_{idx}', '').strip()
@@ -872,9 +986,10 @@ def save_leads():
         elif 'discover' in source:
             contact_source = 'facebook_discover'
 
-        if _save_contact_from_lead(name, phone, email, text, contact_source):
-            saved += 1
+        leads.append({'name': name, 'phone': phone, 'email': email,
+                      'text': text, 'source': contact_source})
 
+    saved = _bulk_save_leads(leads)
     db.session.commit()
     flash(f'Saved {saved} new contacts from Facebook.', 'success')
     return redirect(url_for('facebook.dashboard'))
@@ -894,38 +1009,28 @@ def auto_fetch_fb_enquiries(app):
         # Scan own page
         if config['page_id']:
             leads, _ = _scan_source_feed(config['page_id'], 'page')
-            for lead in leads:
-                if _save_contact_from_lead(lead['name'], lead['phone'], lead['email'],
-                                           lead['text'], 'facebook_comment'):
-                    saved += 1
+            saved += _bulk_save_leads(leads, 'facebook_comment')
 
         # Scan configured groups
-        for group_id in config['group_ids']:
-            leads, _ = _scan_source_feed(group_id, 'group')
-            for lead in leads:
-                if _save_contact_from_lead(lead['name'], lead['phone'], lead['email'],
-                                           lead['text'], 'facebook_group'):
-                    saved += 1
+        for leads, _ in _scan_feeds([(group_id, 'group') for group_id in config['group_ids']]):
+            saved += _bulk_save_leads(leads, 'facebook_group')
 
         # Scan all saved sources
         scanned_ids = set(config['group_ids'])
         if config['page_id']:
             scanned_ids.add(config['page_id'])
 
-        sources = db.session.query(FacebookSource).filter_by(is_active=True).all()
-        for source in sources:
+        sources = []
+        for source in db.session.query(FacebookSource).filter_by(is_active=True).all():
             if source.fb_id in scanned_ids:
                 continue
             scanned_ids.add(source.fb_id)
+            sources.append(source)
 
-            contact_source = 'facebook_page' if source.source_type == 'page' else 'facebook_group'
-            leads, _ = _scan_source_feed(source.fb_id, source.source_type)
-            saved_this = 0
-            for lead in leads:
-                if _save_contact_from_lead(lead['name'], lead['phone'], lead['email'],
-                                           lead['text'], contact_source):
-                    saved_this += 1
-                    saved += 1
+        source_scans = _scan_feeds([(s.fb_id, s.source_type) for s in sources])
+        for source, (leads, _) in zip(sources, source_scans):
+            saved_this = _bulk_save_leads(leads)
+            saved += saved_this
 
             source.last_scanned = datetime.now(timezone.utc)
             source.leads_found += saved_this
@@ -11,7 +11,8 @@ from flask import (Blueprint, render_template, request, redirect, url_for,
                    flash)
 
 from app_package import db
-from app_package.models import HotelTracker, HotelListing, AppSetting
+from app_package.models import (HotelTracker, HotelListing, AppSetting,
+                                LISTING_DESCRIPTION_MAX)
 
 hotel_tracker_bp = Blueprint('hotel_tracker', __name__,
                              template_folder='../templates')
@@ -208,7 +209,7 @@ def check_hotel_tracker(tracker):
                 url=item_url[:1000],
                 image_url=item.get('image_url', '')[:1000],
                 platform=platform,
-                description=item.get('description', ''),
+                description=item.get('description', '')[:LISTING_DESCRIPTION_MAX],
                 is_new=True,
             )
             db.session.add(listing)
@@ -267,8 +268,8 @@ def send_hotel_alert(tracker, new_listings):
 def dashboard():
     trackers = db.session.query(HotelTracker).order_by(HotelTracker.created_at.desc()).all()
     for t in trackers:
-        t.total_listings = t.listings.count()
-        t.new_listings = t.listings.filter_by(is_new=True).count()
+        t.total_listings = db.session.query(HotelListing).filter_by(tracker_id=t.id).count()
+        t.new_listings = db.session.query(HotelListing).filter_by(tracker_id=t.id, is_new=True).count()
     return render_template('hotel_tracker/dashboard.html', trackers=trackers)
 
 
@@ -333,6 +334,7 @@ def delete_tracker(tracker_id):
     tracker = db.session.get(HotelTracker, tracker_id)
     if tracker:
         name = tracker.destination
+        db.session.query(HotelListing).filter_by(tracker_id=tracker.id).delete()
         db.session.delete(tracker)
         db.session.commit()
         flash(f'Hotel tracker for "{name}" deleted.', 'success')
@@ -347,17 +349,21 @@ def results(tracker_id):
         return redirect(url_for('hotel_tracker.dashboard'))
 
     page = request.args.get('page', 1, type=int)
-    listings = (tracker.listings
+    listings = (db.session.query(HotelListing)
+                .options(db.undefer(HotelListing.description))
+                .filter_by(tracker_id=tracker.id)
                 .order_by(HotelListing.found_at.desc())
                 .paginate(page=page, per_page=20, error_out=False))
 
+    html = render_template('hotel_tracker/results.html',
+                           tracker=tracker, listings=listings)
+
     db.session.query(HotelListing).filter_by(
         tracker_id=tracker_id, is_new=True
     ).update({'is_new': False})
     db.session.commit()
 
-    return render_template('hotel_tracker/results.html',
-                           tracker=tracker, listings=listings)
+    return html
 
 
 @hotel_tracker_bp.route('/check/<int:tracker_id>', methods=['POST'])
@@ -12,7 +12,8 @@ from flask import (Blueprint, render_template, request, redirect, url_for,
 
 from app_package import db
 from app_package.models import (JobTracker, JobListing, AppSetting,
-                                CandidateSearch, CandidateResult, Contact)
+                                CandidateSearch, CandidateResult, Contact,
+                                LISTING_DESCRIPTION_MAX)
 
 job_tracker_bp = Blueprint('job_tracker', __name__,
                            template_folder='../templates')
@@ -445,7 +446,7 @@ def check_job_tracker(tracker):
                 experience=item.get('experience', '')[:100],
                 url=item_url[:1000],
                 platform=platform,
-                description=item.get('description', ''),
+                description=item.get('description', '')[:LISTING_DESCRIPTION_MAX],
                 posted_date=item.get('posted_date', '')[:100],
                 is_new=True,
             )
@@ -504,8 +505,8 @@ def send_job_alert(tracker, new_listings):
 def dashboard():
     trackers = db.session.query(JobTracker).order_by(JobTracker.created_at.desc()).all()
     for t in trackers:
-        t.total_listings = t.listings.count()
-        t.new_listings = t.listings.filter_by(is_new=True).count()
+        t.total_listings = db.session.query(JobListing).filter_by(tracker_id=t.id).count()
+        t.new_listings = db.session.query(JobListing).filter_by(tracker_id=t.id, is_new=True).count()
     platform_names = [label for _, label in PLATFORM_CHOICES]
     return render_template('job_tracker/dashboard.html', trackers=trackers,
                            platform_names=platform_names)
@@ -574,6 +575,7 @@ def delete_tracker(tracker_id):
     tracker = db.session.get(JobTracker, tracker_id)
     if tracker:
         name = tracker.search_query
+        db.session.query(JobListing).filter_by(tracker_id=tracker.id).delete()
         db.session.delete(tracker)
         db.session.commit()
         flash(f'Job tracker "{name}" deleted.', 'success')
@@ -588,17 +590,21 @@ def results(tracker_id):
         return redirect(url_for('job_tracker.dashboard'))
 
     page = request.args.get('page', 1, type=int)
-    listings = (tracker.listings
+    listings = (db.session.query(JobListing)
+                .options(db.undefer(JobListing.description))
+                .filter_by(tracker_id=tracker.id)
                 .order_by(JobListing.found_at.desc())
                 .paginate(page=page, per_page=20, error_out=False))
 
+    html = render_template('job_tracker/results.html',
+                           tracker=tracker, listings=listings)
+
     db.session.query(JobListing).filter_by(
         tracker_id=tracker_id, is_new=True
     ).update({'is_new': False})
     db.session.commit()
 
-    return render_template('job_tracker/results.html',
-                           tracker=tracker, listings=listings)
+    return html
 
 
 @job_tracker_bp.route('/check/<int:tracker_id>', methods=['POST'])
@@ -1185,7 +1191,8 @@ def candidate_results(search_id):
     except (json.JSONDecodeError, TypeError):
         search.platform_list = ['linkedin']
 
-    results = (search.results
+    results = (db.session.query(CandidateResult)
+               .filter_by(search_id=search.id)
                .order_by(CandidateResult.found_at.desc())
                .all())
     return render_template('job_tracker/candidate_results.html',
@@ -1198,6 +1205,7 @@ def delete_candidate_search(search_id):
     """Delete a candidate search and all its results."""
     search = db.session.get(CandidateSearch, search_id)
     if search:
+        db.session.query(CandidateResult).filter_by(search_id=search.id).delete()
         db.session.delete(search)
         db.session.commit()
         flash('Search deleted.', 'success')
@@ -1259,7 +1267,7 @@ def save_all_candidates(search_id):
         flash('Search not found.', 'warning')
         return redirect(url_for('job_tracker.candidates_dashboard'))
 
-    unsaved = search.results.filter_by(is_saved=False).all()
+    unsaved = db.session.query(CandidateResult).filter_by(search_id=search.id, is_saved=False).all()
     saved_count = 0
     for result in unsaved:
         profile_url = result.profile_url
@@ -1336,7 +1344,8 @@ def find_all_candidate_contacts(search_id):
         flash('Search not found.', 'warning')
         return redirect(url_for('job_tracker.candidates_dashboard'))
 
-    results = search.results.filter(
+    results = db.session.query(CandidateResult).filter(
+        CandidateResult.search_id == search.id,
         (CandidateResult.email == '') | (CandidateResult.email == None)
     ).all()
 
@@ -1391,7 +1400,8 @@ def find_all_candidate_facebook(search_id):
         flash('Search not found.', 'warning')
         return redirect(url_for('job_tracker.candidates_dashboard'))
 
-    results = search.results.filter(
+    results = db.session.query(CandidateResult).filter(
+        CandidateResult.search_id == search.id,
         (CandidateResult.facebook_url == '') | (CandidateResult.facebook_url == None)
     ).all()
 
@@ -1425,7 +1435,7 @@ def export_candidates_csv(search_id):
     writer.writerow(['Name', 'Title', 'Company', 'Location', 'Email', 'Phone',
                       'Platform', 'LinkedIn URL', 'Facebook URL', 'Instagram URL', 'Snippet'])
 
-    for r in search.results.all():
+    for r in db.session.query(CandidateResult).filter_by(search_id=search.id).all():
         writer.writerow([r.name, r.title, r.company, r.location, r.email or '', r.phone or '',
                          r.platform or 'linkedin', r.linkedin_url, r.facebook_url or '',
                          r.instagram_url or '', r.snippet])
@@ -111,20 +111,19 @@ def settings_page():
     }
 
     # Has password/keys set?
-    smtp_pwd_set = bool(db.session.query(AppSetting).filter_by(key='smtp_password').first()
-                        and db.session.query(AppSetting).filter_by(key='smtp_password').first().value)
-    google_key_set = bool(db.session.query(AppSetting).filter_by(key='google_api_key').first()
-                          and db.session.query(AppSetting).filter_by(key='google_api_key').first().value)
-    twilio_set = bool(db.session.query(AppSetting).filter_by(key='twilio_account_sid').first()
-                      and db.session.query(AppSetting).filter_by(key='twilio_account_sid').first().value)
-    fb_token_set = bool(db.session.query(AppSetting).filter_by(key='fb_access_token').first()
-                        and db.session.query(AppSetting).filter_by(key='fb_access_token').first().value)
-    serpapi_key_set = bool(db.session.query(AppSetting).filter_by(key='serpapi_key').first()
-                           and db.session.query(AppSetting).filter_by(key='serpapi_key').first().value)
-    gemini_key_set = bool(db.session.query(AppSetting).filter_by(key='gemini_api_key').first()
-                          and db.session.query(AppSetting).filter_by(key='gemini_api_key').first().value)
-    youtube_key_set = bool(db.session.query(AppSetting).filter_by(key='youtube_api_key').first()
-                           and db.session.query(AppSetting).filter_by(key='youtube_api_key').first().value)
+    secret_keys = ['smtp_password', 'google_api_key', 'twilio_account_sid', 'fb_access_token',
+                   'serpapi_key', 'gemini_api_key', 'youtube_api_key']
+    keys_set = set(db.session.execute(
+        db.select(AppSetting.key).where(AppSetting.key.in_(secret_keys),
+                                        AppSetting.value != '')
+    ).scalars())
+    smtp_pwd_set = 'smtp_password' in keys_set
+    google_key_set = 'google_api_key' in keys_set
+    twilio_set = 'twilio_account_sid' in keys_set
+    fb_token_set = 'fb_access_token' in keys_set
+    serpapi_key_set = 'serpapi_key' in keys_set
+    gemini_key_set = 'gemini_api_key' in keys_set
+    youtube_key_set = 'youtube_api_key' in keys_set
 
     # Scheduler jobs
     jobs = {j.job_name: j for j in db.session.query(ScheduledJob).all()}
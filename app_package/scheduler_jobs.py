@@ -1,9 +1,10 @@
 """Scheduled job definitions for automated daily tasks."""
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from app_package import db
+from app_package import db, scheduler
 from app_package.models import (Contact, MessageLog, Brochure, AppSetting,
-                                ScheduledJob, SearchLog, DealTracker, JobTracker,
+                                ScheduledJob, SearchLog, JobTracker,
                                 HotelTracker)
 
 logger = logging.getLogger(__name__)
@@ -80,7 +81,9 @@ def run_daily_email(app):
         if not job or not job.is_enabled:
             return
 
-        from app_package.routes.email_sender import send_single_email, render_email_template, get_smtp_config
+        from app_package.routes.email_sender import (SendPacer, SmtpSession, load_attachment,
+                                                     send_single_email, render_email_template,
+                                                     get_smtp_config)
 
         smtp_config = get_smtp_config()
         if not smtp_config['username']:
@@ -107,33 +110,39 @@ def run_daily_email(app):
 
         sent = 0
         failed = 0
-        import time
-        for contact in contacts:
-            ctx = {**context_base,
-                   'company_name': contact.company_name,
-                   'contact_person': contact.contact_person}
-            subject, body = render_email_template('brochure_intro', ctx)
-
-            log = MessageLog(
-                contact_id=contact.id, channel='email',
-                subject=subject, body_preview=body[:200],
-                brochure_id=brochure.id if brochure else None,
-                status='pending'
-            )
-            db.session.add(log)
-            db.session.commit()
-
-            success, error = send_single_email(contact, subject, body, brochure, smtp_config)
-            log.status = 'sent' if success else 'failed'
-            log.error_message = error
-            log.sent_at = datetime.now(timezone.utc) if success else None
-            if success:
-                contact.status = 'contacted'
-                sent += 1
-            else:
-                failed += 1
-            db.session.commit()
-            time.sleep(3)
+        attachment = load_attachment(brochure) if brochure else None
+        if brochure and attachment is None:
+            logger.warning('Default brochure file %s is missing; sending without it',
+                           brochure.stored_filename)
+        pacer = SendPacer(app.config['EMAIL_SEND_INTERVAL'])
+        with SmtpSession(smtp_config) as session:
+            for contact in contacts:
+                ctx = {**context_base,
+                       'company_name': contact.company_name,
+                       'contact_person': contact.contact_person}
+                subject, body = render_email_template('brochure_intro', ctx)
+
+                log = MessageLog(
+                    contact_id=contact.id, channel='email',
+                    subject=subject, body_preview=body[:200],
+                    brochure_id=brochure.id if brochure else None,
+                    status='pending'
+                )
+                db.session.add(log)
+                db.session.commit()
+
+                pacer.wait()
+                success, error = send_single_email(contact, subject, body, smtp_config=smtp_config,
+                                                   session=session, attachment=attachment)
+                log.status = 'sent' if success else 'failed'
+                log.error_message = error
+                log.sent_at = datetime.now(timezone.utc) if success else None
+                if success:
+                    contact.status = 'contacted'
+                    sent += 1
+                else:
+                    failed += 1
+                db.session.commit()
 
         job.last_run = datetime.now(timezone.utc)
         job.last_status = 'success'
@@ -217,21 +226,21 @@ def run_daily_whatsapp(app):
 def run_daily_deal_check(app):
     """Check all active deal trackers for new listings and send alerts."""
     with app.app_context():
-        from app_package.routes.deal_tracker import check_tracker, send_deal_alert
+        from app_package.routes.deal_tracker import (check_trackers, runnable_trackers,
+                                                     send_deal_alert)
 
-        trackers = db.session.query(DealTracker).filter_by(is_active=True).all()
+        trackers = runnable_trackers()
         if not trackers:
             return
 
         total_new = 0
-        for tracker in trackers:
+        for tracker, new_listings in check_trackers(trackers):
             try:
-                new_listings = check_tracker(tracker)
                 if new_listings:
                     send_deal_alert(tracker, new_listings)
                     total_new += len(new_listings)
             except Exception as e:
-                logger.error('Deal check failed for tracker %s: %s', tracker.id, e)
+                logger.error('Deal alert failed for tracker %s: %s', tracker.id, e)
 
         logger.info('Daily deal check: %d trackers, %d new listings', len(trackers), total_new)
 
@@ -278,3 +287,41 @@ def run_daily_hotel_check(app):
                 logger.error('Hotel check failed for tracker %s: %s', tracker.id, e)
 
         logger.info('Daily hotel check: %d trackers, %d new hotels', len(trackers), total_new)
+
+
+# ---------------------------------------------------------------------------
+#  Scheduler entry points — importable, argument-free callables so the jobs
+#  can be stored in the persistent job store.
+# ---------------------------------------------------------------------------
+
+def daily_search_task():
+    run_daily_search(scheduler.app)
+
+
+def daily_email_task():
+    run_daily_email(scheduler.app)
+
+
+def daily_whatsapp_task():
+    run_daily_whatsapp(scheduler.app)
+
+
+def daily_facebook_task():
+    from app_package.routes.facebook import auto_fetch_fb_enquiries
+    auto_fetch_fb_enquiries(scheduler.app)
+
+
+def daily_tracker_check_task():
+    """Run the deal, job and hotel checks side by side.
+
+    The checks scrape unrelated sites, so they overlap their network waits
+    instead of running as three separate jobs. Each check pushes its own app
+    context and therefore gets its own DB session.
+    """
+    app = scheduler.app
+    checks = (run_daily_deal_check, run_daily_job_check, run_daily_hotel_check)
+    with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+        futures = {pool.submit(check, app): check.__name__ for check in checks}
+    for future, name in futures.items():
+        if future.exception() is not None:
+            logger.error('%s failed: %s', name, future.exception())
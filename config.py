@@ -1,3 +1,4 @@
+import functools
 import os
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet
@@ -14,6 +15,15 @@ class Config:
         _db_url = _db_url.replace('postgres://', 'postgresql://', 1)
     SQLALCHEMY_DATABASE_URI = _db_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Ping pooled connections on checkout: scheduler jobs run hours apart and
+    # idle Postgres connections get dropped, so pay a cheap SELECT 1 instead
+    # of a failed query.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
+    if not _db_url.startswith('sqlite'):
+        SQLALCHEMY_ENGINE_OPTIONS.update({'pool_size': 10, 'max_overflow': 20})
     WTF_CSRF_ENABLED = True
 
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)),
@@ -22,19 +32,26 @@ class Config:
     CSV_TEMP_FOLDER = os.path.join(UPLOAD_FOLDER, 'csv_temp')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB
 
+    # Hand brochure downloads to the front-end server via X-Sendfile. Only
+    # enable behind a proxy that honours the header (nginx/Apache); gunicorn
+    # on its own already serves files with sendfile(2).
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
     ALLOWED_BROCHURE_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
-    ALLOWED_BROCHURE_MIMETYPES = {
-        'application/pdf', 'image/png', 'image/jpeg'
-    }
 
     # Rate limiting for email
     EMAIL_RATE_PER_HOUR = 20
     EMAIL_RATE_PER_DAY = 200
+    # Minimum seconds between the start of consecutive sends in a batch
+    EMAIL_SEND_INTERVAL = 3
+    # Messages sent over one SMTP connection before it is re-opened
+    SMTP_MAX_PER_SESSION = int(os.getenv('SMTP_MAX_PER_SESSION', '100'))
 
     # Fernet encryption key for credentials
     FERNET_KEY = os.getenv('FERNET_KEY', '')
 
     @staticmethod
+    @functools.lru_cache(maxsize=1)
     def get_fernet():
         key = Config.FERNET_KEY
         if not key:
@@ -57,5 +74,17 @@ class Config:
                 pass
         return Fernet(key.encode() if isinstance(key, str) else key)
 
-    # APScheduler
+    # APScheduler — only started when ENABLE_SCHEDULER is set (the web
+    # service sets it), so flask CLI commands and scripts don't run jobs.
+    # Jobs persist in the app database so missed runs are caught up (once)
+    # after a restart.
+    ENABLE_SCHEDULER = os.getenv('ENABLE_SCHEDULER', '').lower() in ('1', 'true', 'yes')
     SCHEDULER_API_ENABLED = True
+    SCHEDULER_JOBSTORES = {
+        'default': {'type': 'sqlalchemy', 'url': _db_url},
+    }
+    SCHEDULER_JOB_DEFAULTS = {
+        'coalesce': True,
+        'max_instances': 1,
+        'misfire_grace_time': 3600,
+    }